@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import re
+
+
+# Hiring vocabulary seen in job posts; matched on raw text, so Arabic ي/ك variants are allowed.
+JOB_KEYWORDS = [
+    "استخدام",
+    "همکاری",
+    "رزومه",
+    "نیازمند",
+    "جذب نیرو",
+    "فرصت شغلی",
+    "موقعیت شغلی",
+    "حقوق",
+    "متقاضی",
+    r"\bhiring\b",
+    r"\bresume\b",
+    r"\bcv\b",
+]
+
+# Groups scoring below this are routed to the non-job output.
+TRIAGE_MIN_SCORE = 1
+
+
+def compile_keywords(keywords: list[str]) -> re.Pattern:
+    parts = [k.replace("ی", "[یي]").replace("ک", "[کك]") for k in keywords]
+    return re.compile("|".join(parts), re.IGNORECASE)
+
+
+JOB_KEYWORD_RE = compile_keywords(JOB_KEYWORDS)
+
+
+def triage_score(text: str, has_title: bool, fields: dict[str, str | None]) -> int:
+    # One point per extracted field, one for a quoted title, one for any hiring keyword.
+    score = sum(v is not None for v in fields.values())
+    score += int(has_title)
+    score += int(JOB_KEYWORD_RE.search(text or "") is not None)
+    return score
@@ -2,16 +2,14 @@ from __future__ import annotations
 
 from pathlib import Path
 import argparse
-import re
-import html as htmllib
 import sys
 
+import numpy as np
 import pandas as pd
 
-
-PERSIAN_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹", "0123456789")
-ARABIC_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩", "0123456789")
-ARABIC_LETTERS = str.maketrans({"ي": "ی", "ك": "ک", "ة": "ه", "ۀ": "ه", "ؤ": "و", "إ": "ا", "أ": "ا"})
+from multilabel_codec import explode_labels
+from skill_matrix_store import align_rows, group_skill_counts, load_skill_matrix, skill_counts
+from text_normalize import normalize_series, report_normalize_calls
 
 
 def configure_stdout():
@@ -22,22 +20,24 @@ def configure_stdout():
         pass
 
 
-def normalize_text(s: str) -> str:
-    s = htmllib.unescape(s or "")
-    s = s.translate(ARABIC_LETTERS).translate(PERSIAN_DIGITS).translate(ARABIC_DIGITS)
-    s = s.replace("\u200c", " ")
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+def sparse_counts(store: dict, rows: np.ndarray, roles: pd.Series, role_col: str) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    # Same three tables as the exploded path, from bincounts over the CSR skill matrix.
+    skills = store["skills"]["skill"].to_numpy(dtype=object)
+    codes, uniq = pd.factorize(roles)
+    by_role = group_skill_counts(store, rows, codes, len(uniq))
+    r, c = np.nonzero(by_role)
+    rs = pd.DataFrame({role_col: uniq[r], "skill": skills[c], "n_ads": by_role[r, c]})
+    rs = rs.sort_values([role_col, "skill"]).reset_index(drop=True)
 
+    has_skill = store["indptr"][rows + 1] > store["indptr"][rows]
+    n_role = np.bincount(codes[has_skill], minlength=len(uniq))
+    role_tot = pd.DataFrame({role_col: uniq, "n_ads_role": n_role})
+    role_tot = role_tot[role_tot["n_ads_role"] > 0].sort_values(role_col).reset_index(drop=True)
 
-def split_skill_list(s: str) -> list[str]:
-    if s is None:
-        return []
-    t = str(s).strip()
-    if t == "" or t.lower() in {"nan", "none"}:
-        return []
-    parts = [p.strip() for p in t.split("|")]
-    return [p for p in parts if p]
+    n_global = skill_counts(store, rows)
+    global_tot = pd.DataFrame({"skill": skills, "n_ads_global": n_global})
+    global_tot = global_tot[global_tot["n_ads_global"] > 0].sort_values("skill").reset_index(drop=True)
+    return rs, role_tot, global_tot
 
 
 def main():
@@ -48,6 +48,7 @@ def main():
     parser.add_argument("--skills-meta", type=str, default="outputs/skills_counts.csv", help="Skill meta (group/category/parent)")
     parser.add_argument("--skills-col", type=str, default="skills_extracted", help="Which extracted skills column to use")
     parser.add_argument("--role-col", type=str, default="job_role_fa", help="Role column name")
+    parser.add_argument("--skill-matrix", type=str, default="outputs/ads_skill_matrix.npz", help="Sparse ad x skill matrix from extract_skills.py (used when it matches the input)")
     parser.add_argument("--out", type=str, default="outputs/role_skill_all.csv", help="Output CSV (long)")
     parser.add_argument("--pivot-out", type=str, default="outputs/role_skill_all_pivot.csv", help="Wide pivot (pct_of_role)")
     args = parser.parse_args()
@@ -80,38 +81,49 @@ def main():
         raise ValueError(f"Missing skills column: {args.skills_col}. Available: {ads.columns.tolist()}")
 
     d = ads[[ad_id_col, args.role_col, args.skills_col]].copy()
-    d[args.role_col] = d[args.role_col].fillna("نامشخص").astype(str).map(normalize_text)
-    d["_skills"] = d[args.skills_col].fillna("").map(split_skill_list)
-    long = d[[ad_id_col, args.role_col, "_skills"]].explode("_skills").rename(columns={"_skills": "skill"})
-    long["skill"] = long["skill"].fillna("").astype(str).map(lambda x: x.strip())
-    long = long[long["skill"].ne("")].copy()
-
-    if long.empty:
-        raise RuntimeError("No extracted skills found to analyze.")
-
-  
-    rs = (
-        long.drop_duplicates(subset=[ad_id_col, args.role_col, "skill"])
-        .groupby([args.role_col, "skill"], as_index=False)
-        .size()
-        .rename(columns={"size": "n_ads"})
-    )
-
-    role_tot = (
-        long.drop_duplicates(subset=[ad_id_col, args.role_col])
-        .groupby(args.role_col, as_index=False)
-        .size()
-        .rename(columns={"size": "n_ads_role"})
-    )
+    d[args.role_col] = normalize_series(d[args.role_col].fillna("نامشخص"))
+
+    # The persisted matrix replaces splitting and exploding the skills strings when its
+    # rows cover every ad of the input.
+    store = load_skill_matrix((root / args.skill_matrix).resolve(), args.skills_col)
+    rows = align_rows(store, d[ad_id_col]) if store is not None and ad_id_col == "_ad_key" else None
+
+    if rows is not None:
+        if store["indptr"][rows + 1].sum() == store["indptr"][rows].sum():
+            raise RuntimeError("No extracted skills found to analyze.")
+        rs, role_tot, global_tot = sparse_counts(store, rows, d[args.role_col], args.role_col)
+        print(f" Counts from sparse skill matrix: {args.skill_matrix}")
+    else:
+        long = explode_labels(d, args.skills_col, "skill")[[ad_id_col, args.role_col, "skill"]]
+        long["skill"] = long["skill"].astype(str)
+
+        if long.empty:
+            raise RuntimeError("No extracted skills found to analyze.")
+
+      
+        rs = (
+            long.drop_duplicates(subset=[ad_id_col, args.role_col, "skill"])
+            .groupby([args.role_col, "skill"], as_index=False)
+            .size()
+            .rename(columns={"size": "n_ads"})
+        )
+
+        role_tot = (
+            long.drop_duplicates(subset=[ad_id_col, args.role_col])
+            .groupby(args.role_col, as_index=False)
+            .size()
+            .rename(columns={"size": "n_ads_role"})
+        )
+
+        global_tot = (
+            long.drop_duplicates(subset=[ad_id_col, "skill"])
+            .groupby("skill", as_index=False)
+            .size()
+            .rename(columns={"size": "n_ads_global"})
+        )
+
     rs = rs.merge(role_tot, on=args.role_col, how="left")
     rs["pct_of_role"] = (rs["n_ads"] / rs["n_ads_role"].clip(lower=1)).round(4)
-
-    global_tot = (
-        long.drop_duplicates(subset=[ad_id_col, "skill"])
-        .groupby("skill", as_index=False)
-        .size()
-        .rename(columns={"size": "n_ads_global"})
-    )
     rs = rs.merge(global_tot, on="skill", how="left")
 
     
@@ -129,6 +141,7 @@ def main():
 
     print(" Saved:", out_path)
     print(" Saved:", pivot_path)
+    report_normalize_calls("analyze_role_skill_matrix")
     print("Roles:", rs[args.role_col].nunique(), "Skills:", rs["skill"].nunique())
 
 
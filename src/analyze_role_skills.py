@@ -2,16 +2,15 @@ from __future__ import annotations
 
 from pathlib import Path
 import argparse
-import re
-import html as htmllib
 import math
+import numpy as np
 import pandas as pd
 import sys
 
-
-PERSIAN_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹", "0123456789")
-ARABIC_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩", "0123456789")
-ARABIC_LETTERS = str.maketrans({"ي": "ی", "ك": "ک", "ة": "ه", "ۀ": "ه", "ؤ": "و", "إ": "ا", "أ": "ا"})
+from build_dataset import build_ad_key
+from multilabel_codec import explode_labels
+from skill_matrix_store import align_ad_rows, group_skill_counts, load_skill_matrix, skill_counts
+from text_normalize import normalize_series, report_normalize_calls
 
 
 def configure_stdout():
@@ -22,14 +21,6 @@ def configure_stdout():
         pass
 
 
-def normalize_text(s: str) -> str:
-    s = htmllib.unescape(s or "")
-    s = s.translate(ARABIC_LETTERS).translate(PERSIAN_DIGITS).translate(ARABIC_DIGITS)
-    s = s.replace("\u200c", " ")
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
-
-
 TARGET_ROLES = [
     "معامله‌گر اوراق بهادار",
     "معامله‌گر بورس کالا",
@@ -142,17 +133,6 @@ def try_merge_roles(df_skills: pd.DataFrame, root: Path) -> pd.DataFrame:
     )
 
 
-def explode_skills(df: pd.DataFrame, skills_col: str) -> pd.DataFrame:
-    s = df[skills_col].fillna("").astype(str)
-    lst = s.map(lambda x: [t.strip() for t in x.split("|") if t.strip()])
-    out = df.copy()
-    out["_skill_list"] = lst
-    out = out.explode("_skill_list")
-    out = out.rename(columns={"_skill_list": "skill"})
-    out = out[out["skill"].notna() & (out["skill"].astype(str).str.len() > 0)].copy()
-    return out
-
-
 def safe_div(a: float, b: float, eps: float = 1e-12) -> float:
     return a / (b if abs(b) > eps else eps)
 
@@ -177,6 +157,12 @@ def parse_args() -> argparse.Namespace:
         default=5,
         help="Minimum number of unique ads for a (role, skill) pair to include in outputs.",
     )
+    p.add_argument(
+        "--skill-matrix",
+        type=str,
+        default="outputs/ads_skill_matrix.npz",
+        help="Sparse ad x skill matrix from extract_skills.py (used when it matches the input).",
+    )
     return p.parse_args()
 
 
@@ -201,7 +187,7 @@ def main():
         raise ValueError("No skills column found. Expected skills_extracted(_fine/_parents).")
 
     # Normalize role strings for reliable matching
-    df[role_col] = df[role_col].fillna("").map(normalize_text)
+    df[role_col] = normalize_series(df[role_col])
     df["_ad_id"] = build_ad_id(df)
 
     # Drop empty roles
@@ -222,12 +208,20 @@ def main():
     if df.empty:
         raise ValueError("No rows after filtering by min-role-ads. Lower --min-role-ads to include more roles.")
 
-    # Explode skills to long format
-    long_df = explode_skills(df, skills_col)
-    long_df["skill"] = long_df["skill"].astype(str)
+    # The persisted matrix replaces splitting and exploding the skills strings when its
+    # rows cover every ad of the input.
+    store = load_skill_matrix((root / args.skill_matrix).resolve(), skills_col)
+    rows = align_ad_rows(store, build_ad_key(df), df["_ad_id"]) if store is not None else None
+
+    if rows is None:
+        # Explode skills to long format
+        long_df = explode_labels(df, skills_col, "skill")
+        long_df["skill"] = long_df["skill"].astype(str)
 
-    # Prevent double counting: count each (ad_id, role, skill) once
-    long_df = long_df.drop_duplicates(subset=["_ad_id", role_col, "skill"])
+        # Prevent double counting: count each (ad_id, role, skill) once
+        long_df = long_df.drop_duplicates(subset=["_ad_id", role_col, "skill"])
+    else:
+        print(f" Counts from sparse skill matrix: {args.skill_matrix}")
 
     # Role totals (unique ads per role)
     role_totals = (
@@ -241,25 +235,42 @@ def main():
     total_ads = df.drop_duplicates(subset=["_ad_id"]).shape[0]
 
     # Global skill prevalence (unique ads containing each skill)
-    global_skill = (
-        long_df.drop_duplicates(subset=["_ad_id", "skill"])
-        .groupby("skill", as_index=False)
-        .size()
-        .rename(columns={"size": "n_ads_global"})
-    )
+    if rows is None:
+        global_skill = (
+            long_df.drop_duplicates(subset=["_ad_id", "skill"])
+            .groupby("skill", as_index=False)
+            .size()
+            .rename(columns={"size": "n_ads_global"})
+        )
+    else:
+        skills = store["skills"]["skill"].to_numpy(dtype=object)
+        first_ad = ~df.duplicated(subset=["_ad_id"]).to_numpy()
+        global_skill = pd.DataFrame({"skill": skills, "n_ads_global": skill_counts(store, rows[first_ad])})
+        global_skill = global_skill[global_skill["n_ads_global"] > 0].sort_values("skill").reset_index(drop=True)
 
     if args.min_skill_ads_global and args.min_skill_ads_global > 1:
         keep_skills = set(global_skill[global_skill["n_ads_global"] >= args.min_skill_ads_global]["skill"].tolist())
-        long_df = long_df[long_df["skill"].isin(keep_skills)].copy()
+        if rows is None:
+            long_df = long_df[long_df["skill"].isin(keep_skills)].copy()
         global_skill = global_skill[global_skill["skill"].isin(keep_skills)].copy()
 
     global_skill["p_skill"] = global_skill["n_ads_global"].map(lambda x: safe_div(float(x), float(total_ads)))
 
     # Role-skill counts
+    if rows is None:
+        pair_counts = long_df.groupby([role_col, "skill"], as_index=False).size().rename(columns={"size": "n_ads"})
+    else:
+        # Each (ad, role) once; ads per (role, skill) are then bincounts over their matrix rows.
+        first = ~df.duplicated(subset=["_ad_id", role_col]).to_numpy() & df[role_col].notna().to_numpy()
+        codes, roles = pd.factorize(df[role_col][first])
+        by_role = group_skill_counts(store, rows[first], codes, len(roles))
+        r, c = np.nonzero(by_role)
+        pair_counts = pd.DataFrame({role_col: np.asarray(roles, dtype=object)[r], "skill": skills[c], "n_ads": by_role[r, c]})
+        pair_counts = pair_counts[pair_counts["skill"].isin(global_skill["skill"])]
+        pair_counts = pair_counts.sort_values([role_col, "skill"]).reset_index(drop=True)
+
     role_skill = (
-        long_df.groupby([role_col, "skill"], as_index=False)
-        .size()
-        .rename(columns={"size": "n_ads"})
+        pair_counts
         .merge(role_totals, on=role_col, how="left")
         .merge(global_skill, on="skill", how="left")
     )
@@ -354,6 +365,7 @@ def main():
     print(" Saved:", out_lift_core)
     print(" Saved:", out_top_pct)
     print(" Saved:", out_top_lift)
+    report_normalize_calls("analyze_role_skills")
 
     preview_roles = list(top_lift_df["عنوان_شغل_استاندارد"].head(5).values)
     for role in preview_roles:
@@ -2,16 +2,13 @@ from __future__ import annotations
 
 from pathlib import Path
 import argparse
-import re
-import html as htmllib
 import sys
 
+import numpy as np
 import pandas as pd
 
-
-PERSIAN_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹", "0123456789")
-ARABIC_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩", "0123456789")
-ARABIC_LETTERS = str.maketrans({"ي": "ی", "ك": "ک", "ة": "ه", "ۀ": "ه", "ؤ": "و", "إ": "ا", "أ": "ا"})
+from multilabel_codec import explode_labels
+from skill_matrix_store import align_ad_rows, group_skill_counts, load_skill_matrix, relabel_skills, skill_counts
 
 
 def configure_stdout():
@@ -22,36 +19,38 @@ def configure_stdout():
         pass
 
 
-def normalize_text(s: str) -> str:
-    s = htmllib.unescape(s or "")
-    s = s.translate(ARABIC_LETTERS).translate(PERSIAN_DIGITS).translate(ARABIC_DIGITS)
-    s = s.replace("\u200c", " ")
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
-
-
 def build_ad_id(df: pd.DataFrame) -> pd.Series:
     if "source_file" in df.columns and "date_title" in df.columns:
         return df["source_file"].astype(str) + "|" + df["date_title"].astype(str)
     return df.index.astype(str)
 
 
-def split_skill_list(s: str) -> list[str]:
-    if s is None:
-        return []
-    t = str(s).strip()
-    if t == "" or t.lower() in {"nan", "none"}:
-        return []
-    parts = [p.strip() for p in t.split("|")]
-    return [p for p in parts if p]
-
-
 def counts_unique(df: pd.DataFrame, keys: list[str], out_cols: list[str]):
     d = df.drop_duplicates(subset=keys).copy()
     g = d.groupby(out_cols, as_index=False).size().rename(columns={"size": "n_ads"})
     return g.sort_values("n_ads", ascending=False)
 
 
+def sparse_counts_unique(store: dict, rows: np.ndarray, ads: pd.DataFrame, label: str, out_cols: list[str]) -> pd.DataFrame:
+    # counts_unique over the CSR matrix: ads per label (the store's columns, e.g. skill
+    # groups after relabel_skills), or per (column, label) when out_cols names another column.
+    labels = store["skills"]["skill"].to_numpy(dtype=object)
+    by = [c for c in out_cols if c != label]
+    if by:
+        first = ~ads.duplicated(subset=["_ad_id", by[0]]).to_numpy() & ads[by[0]].notna().to_numpy()
+        codes, uniq = pd.factorize(ads[by[0]][first])
+        counts = group_skill_counts(store, rows[first], codes, len(uniq))
+        r, c = np.nonzero(counts)
+        out = pd.DataFrame({by[0]: np.asarray(uniq, dtype=object)[r], label: labels[c], "n_ads": counts[r, c]})
+    else:
+        first = ~ads.duplicated(subset=["_ad_id"]).to_numpy()
+        out = pd.DataFrame({label: labels, "n_ads": skill_counts(store, rows[first])})
+        out = out[out["n_ads"] > 0]
+    # Same row order as the groupby in counts_unique before its sort by n_ads.
+    out = out[out_cols + ["n_ads"]].sort_values(out_cols).reset_index(drop=True)
+    return out.sort_values("n_ads", ascending=False)
+
+
 def attach_totals_and_pct(df_long: pd.DataFrame, group_cols: list[str], count_col: str = "n_ads") -> pd.DataFrame:
     if df_long is None or df_long.empty:
         return df_long
@@ -68,6 +67,7 @@ def main():
     parser.add_argument("--inputs", type=str, default="outputs/ads_enriched.csv", help="Enriched ads CSV (includes skills)")
     parser.add_argument("--skills-meta", type=str, default="outputs/skills_counts.csv", help="Skill metadata with group/category")
     parser.add_argument("--skills-col", type=str, default="skills_extracted", help="Which skills column to use")
+    parser.add_argument("--skill-matrix", type=str, default="outputs/ads_skill_matrix.npz", help="Sparse ad x skill matrix from extract_skills.py (used when it matches the input)")
     parser.add_argument("--out-dir", type=str, default="outputs", help="Output directory")
     args = parser.parse_args()
 
@@ -94,72 +94,102 @@ def main():
     fam_col = "job_family_fa" if "job_family_fa" in ads.columns else ("خانواده_شغلی" if "خانواده_شغلی" in ads.columns else None)
 
     ads["_ad_id"] = build_ad_id(ads)
-    ads["_skills_list"] = ads[args.skills_col].fillna("").map(split_skill_list)
-
-    long = ads[["_ad_id"] + ([role_col] if role_col else []) + ([fam_col] if fam_col else []) + ["province", "city", "tehran_district", "tehran_neighborhood", "_skills_list"]].copy()
-    long = long.explode("_skills_list").rename(columns={"_skills_list": "skill"})
-    long["skill"] = long["skill"].fillna("").astype(str).map(lambda x: x.strip())
-    long = long[long["skill"].astype(str).ne("")].copy()
-
-    if long.empty:
-        raise RuntimeError("No skills found to analyze. Check extracted skills columns in ads_enriched.")
-
-    keep_meta_cols = [c for c in ["skill", "group", "category", "parent"] if c in meta.columns]
-    long = long.merge(meta[keep_meta_cols], on="skill", how="left")
-    long["group"] = long["group"].fillna("unknown").astype(str)
-    long["category"] = long["category"].fillna("unknown").astype(str)
 
-    group_counts = counts_unique(long, ["_ad_id", "group"], ["group"])
+    # The persisted matrix replaces splitting and exploding the skills strings when its
+    # rows cover every ad of the input; group/category tables use it relabeled.
+    store = load_skill_matrix((root / args.skill_matrix).resolve(), args.skills_col)
+    rows = align_ad_rows(store, ads["_ad_key"], ads["_ad_id"]) if store is not None and "_ad_key" in ads.columns else None
+
+    if rows is None:
+        long = ads[["_ad_id"] + ([role_col] if role_col else []) + ([fam_col] if fam_col else []) + ["province", "city", "tehran_district", "tehran_neighborhood", args.skills_col]]
+        long = explode_labels(long, args.skills_col, "skill").drop(columns=[args.skills_col])
+        long["skill"] = long["skill"].astype(str)
+
+        if long.empty:
+            raise RuntimeError("No skills found to analyze. Check extracted skills columns in ads_enriched.")
+
+        keep_meta_cols = [c for c in ["skill", "group", "category", "parent"] if c in meta.columns]
+        long = long.merge(meta[keep_meta_cols], on="skill", how="left")
+        long["group"] = long["group"].fillna("unknown").astype(str)
+        long["category"] = long["category"].fillna("unknown").astype(str)
+        cert = long[long["group"].astype(str).eq("certificate") & long["category"].astype(str).eq("capital_market")].copy()
+        has_cert = not cert.empty
+
+        def count(source: str, out_cols: list[str]) -> pd.DataFrame:
+            return counts_unique(cert if source == "certificate" else long, ["_ad_id"] + out_cols, out_cols)
+    else:
+        if store["indptr"][rows + 1].sum() == store["indptr"][rows].sum():
+            raise RuntimeError("No skills found to analyze. Check extracted skills columns in ads_enriched.")
+        print(f" Counts from sparse skill matrix: {args.skill_matrix}")
+
+        skills = store["skills"]["skill"]
+        skill_group = skills.map(meta.set_index("skill")["group"]).fillna("unknown").astype(str)
+        skill_category = skills.map(meta.set_index("skill")["category"]).fillna("unknown").astype(str)
+        stores = {
+            "group": relabel_skills(store, skill_group),
+            "category": relabel_skills(store, skill_category),
+            "certificate": relabel_skills(store, skills.where(skill_group.eq("certificate") & skill_category.eq("capital_market"))),
+            "any": relabel_skills(store, pd.Series("any", index=skills.index)),
+        }
+        has_cert = stores["certificate"]["indptr"][rows + 1].sum() > stores["certificate"]["indptr"][rows].sum()
+
+        def count(source: str, out_cols: list[str]) -> pd.DataFrame:
+            label = next((c for c in out_cols if c in ["group", "category", "skill"]), None)
+            if label is None:
+                # Totals over ads with any skill.
+                return sparse_counts_unique(stores["any"], rows, ads, "_any", out_cols + ["_any"]).drop(columns=["_any"])
+            return sparse_counts_unique(stores["certificate" if source == "certificate" else label], rows, ads, label, out_cols)
+
+    group_counts = count("all", ["group"])
     group_counts.to_csv(out_dir / "skill_group_counts.csv", index=False, encoding="utf-8-sig")
 
-    cat_counts = counts_unique(long, ["_ad_id", "category"], ["category"])
+    cat_counts = count("all", ["category"])
     cat_counts.to_csv(out_dir / "skill_category_counts.csv", index=False, encoding="utf-8-sig")
 
     
     if role_col:
-        rg = counts_unique(long, ["_ad_id", role_col, "group"], [role_col, "group"])
-        role_tot = counts_unique(long, ["_ad_id", role_col], [role_col]).rename(columns={"n_ads": "n_ads_role"})
+        rg = count("all", [role_col, "group"])
+        role_tot = count("all", [role_col]).rename(columns={"n_ads": "n_ads_role"})
         rg = rg.merge(role_tot, on=role_col, how="left")
         rg["pct_of_role"] = (rg["n_ads"] / rg["n_ads_role"].clip(lower=1)).round(4)
         rg = rg.sort_values([role_col, "n_ads"], ascending=[True, False])
         rg.to_csv(out_dir / "role_skill_group_counts.csv", index=False, encoding="utf-8-sig")
 
-        rc = counts_unique(long, ["_ad_id", role_col, "category"], [role_col, "category"])
+        rc = count("all", [role_col, "category"])
         rc = rc.merge(role_tot, on=role_col, how="left")
         rc["pct_of_role"] = (rc["n_ads"] / rc["n_ads_role"].clip(lower=1)).round(4)
         rc = rc.sort_values([role_col, "n_ads"], ascending=[True, False])
         rc.to_csv(out_dir / "role_skill_category_counts.csv", index=False, encoding="utf-8-sig")
 
     if fam_col:
-        fg = counts_unique(long, ["_ad_id", fam_col, "group"], [fam_col, "group"])
-        fam_tot = counts_unique(long, ["_ad_id", fam_col], [fam_col]).rename(columns={"n_ads": "n_ads_family"})
+        fg = count("all", [fam_col, "group"])
+        fam_tot = count("all", [fam_col]).rename(columns={"n_ads": "n_ads_family"})
         fg = fg.merge(fam_tot, on=fam_col, how="left")
         fg["pct_of_family"] = (fg["n_ads"] / fg["n_ads_family"].clip(lower=1)).round(4)
         fg = fg.sort_values([fam_col, "n_ads"], ascending=[True, False])
         fg.to_csv(out_dir / "family_skill_group_counts.csv", index=False, encoding="utf-8-sig")
 
-        fc = counts_unique(long, ["_ad_id", fam_col, "category"], [fam_col, "category"])
+        fc = count("all", [fam_col, "category"])
         fc = fc.merge(fam_tot, on=fam_col, how="left")
         fc["pct_of_family"] = (fc["n_ads"] / fc["n_ads_family"].clip(lower=1)).round(4)
         fc = fc.sort_values([fam_col, "n_ads"], ascending=[True, False])
         fc.to_csv(out_dir / "family_skill_category_counts.csv", index=False, encoding="utf-8-sig")
 
    
-    cert = long[long["group"].astype(str).eq("certificate") & long["category"].astype(str).eq("capital_market")].copy()
-    if not cert.empty:
-        cert_counts = counts_unique(cert, ["_ad_id", "skill"], ["skill"])
+    if has_cert:
+        cert_counts = count("certificate", ["skill"])
         cert_counts.to_csv(out_dir / "certificates_counts.csv", index=False, encoding="utf-8-sig")
 
         if role_col:
-            cr = counts_unique(cert, ["_ad_id", role_col, "skill"], [role_col, "skill"])
-            role_tot = counts_unique(long, ["_ad_id", role_col], [role_col]).rename(columns={"n_ads": "n_ads_role"})
+            cr = count("certificate", [role_col, "skill"])
+            role_tot = count("all", [role_col]).rename(columns={"n_ads": "n_ads_role"})
             cr = cr.merge(role_tot, on=role_col, how="left")
             cr["pct_of_role"] = (cr["n_ads"] / cr["n_ads_role"].clip(lower=1)).round(4)
             cr = cr.sort_values([role_col, "n_ads"], ascending=[True, False])
             cr.to_csv(out_dir / "certificates_by_role.csv", index=False, encoding="utf-8-sig")
 
-            cc = counts_unique(cert, ["_ad_id", role_col, "skill"], ["skill", role_col])
-            cert_tot = counts_unique(cert, ["_ad_id", "skill"], ["skill"]).rename(columns={"n_ads": "n_ads_cert"})
+            cc = count("certificate", ["skill", role_col])
+            cert_tot = count("certificate", ["skill"]).rename(columns={"n_ads": "n_ads_cert"})
             cc = cc.merge(cert_tot, on="skill", how="left")
             cc["pct_of_cert"] = (cc["n_ads"] / cc["n_ads_cert"].clip(lower=1)).round(4)
             cc = cc.sort_values(["skill", "n_ads"], ascending=[True, False])
@@ -1,13 +1,15 @@
 from __future__ import annotations
 
 from pathlib import Path
+from datetime import datetime
 import argparse
+import json
 import sys
 
 import pandas as pd
 from bs4 import BeautifulSoup
 
-from parse_telegram import group_joined_messages
+from parse_telegram import find_export_files, group_joined_messages
 
 
 def configure_stdout():
@@ -25,55 +27,133 @@ def count_messages(soup: BeautifulSoup) -> tuple[int, int]:
     return n_default, n_joined
 
 
-def main():
-    configure_stdout()
-
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--raw-dir", type=str, default="data/raw", help="Telegram export directory (messages*.html)")
-    parser.add_argument("--parsed", type=str, default="outputs/ads_parsed_all.csv", help="Parsed groups CSV")
-    parser.add_argument("--out", type=str, default="outputs/parse_coverage.csv", help="Output CSV path")
-    args = parser.parse_args()
-
-    root = Path(__file__).resolve().parents[1]
-    raw_dir = (root / args.raw_dir).resolve()
-    parsed_path = (root / args.parsed).resolve()
-    out_path = (root / args.out).resolve()
-
-    if not raw_dir.exists():
-        raise FileNotFoundError(f"Raw dir not found: {raw_dir}")
-    if not parsed_path.exists():
-        raise FileNotFoundError(f"Parsed CSV not found: {parsed_path}")
-
-    files = sorted(list(raw_dir.glob("messages*.html")) + list(raw_dir.glob("messages*.htm")), key=lambda p: p.name)
-    if not files:
-        raise FileNotFoundError(f"No messages*.html found in: {raw_dir}")
-
-    parsed = pd.read_csv(parsed_path, encoding="utf-8-sig")
-    groups_by_file = parsed.groupby("source_file", as_index=False).size().rename(columns={"size": "parsed_groups"})
-
+def same_sender_and_time(msg: dict, prev: dict | None) -> bool:
+    # Written apart from telegram_json so --verify does not share the parser's join rule:
+    # same sender on the same day, at most 15 minutes apart (1 second for forwards).
+    if prev is None or prev.get("type") != "message":
+        return False
+    sender = (msg.get("from_id"), msg.get("via_bot"), msg.get("forwarded_from"))
+    if sender != (prev.get("from_id"), prev.get("via_bot"), prev.get("forwarded_from")):
+        return False
+    try:
+        t, t_prev = datetime.fromisoformat(msg["date"]), datetime.fromisoformat(prev["date"])
+    except (KeyError, TypeError, ValueError):
+        return False
+    if t.date() != t_prev.date():
+        return False
+    return abs((t - t_prev).total_seconds()) <= (1 if msg.get("forwarded_from") else 900)
+
+
+def count_json_messages(json_path: Path) -> tuple[int, int, int]:
+    # Whole-file json.load instead of the streaming decoder; a group starts at every message
+    # that does not join the previous one.
+    with open(json_path, encoding="utf-8", errors="ignore") as fh:
+        messages = json.load(fh).get("messages", [])
+    n_default = n_joined = 0
+    prev = None
+    for msg in messages:
+        joined = same_sender_and_time(msg, prev)
+        prev = msg
+        if msg.get("type") != "message":
+            continue
+        n_default += 1
+        n_joined += joined
+    return n_default, n_joined, n_default - n_joined
+
+
+def verify_counts(files: list[Path]) -> pd.DataFrame:
+    # Independent re-parse (BeautifulSoup or json.load); slow, only used with --verify.
     rows = []
     for f in files:
+        if f.suffix.lower() == ".json":
+            n_default, n_joined, n_groups = count_json_messages(f)
+            rows.append(
+                {
+                    "file": f.name,
+                    "verify_default_messages": int(n_default),
+                    "verify_joined_messages": int(n_joined),
+                    "verify_groups": int(n_groups),
+                }
+            )
+            continue
+
         html_text = f.read_text(encoding="utf-8", errors="ignore")
         soup = BeautifulSoup(html_text, "html.parser")
 
         n_default, n_joined = count_messages(soup)
         groups = group_joined_messages(soup)
-        n_groups = len(groups)
 
         rows.append(
             {
                 "file": f.name,
-                "html_default_messages": int(n_default),
-                "html_joined_messages": int(n_joined),
-                "groups_from_html": int(n_groups),
+                "verify_default_messages": int(n_default),
+                "verify_joined_messages": int(n_joined),
+                "verify_groups": int(len(groups)),
             }
         )
+    return pd.DataFrame(rows)
+
+
+def main():
+    configure_stdout()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--raw-dir", type=str, default="data/raw", help="Telegram export directory (messages*.html or result.json), used by --verify")
+    parser.add_argument("--format", type=str, default="auto", choices=["auto", "html", "json"], help="Export format parse_telegram.py read (auto = result.json if present, else messages*.html)")
+    parser.add_argument("--channel", type=str, default=None, help="With --verify and a multi-channel sidecar: channel that --raw-dir belongs to")
+    parser.add_argument("--parsed", type=str, default="outputs/ads_parsed_all.csv", help="Parsed groups CSV")
+    parser.add_argument("--coverage", type=str, default=None, help="Coverage sidecar written by parse_telegram.py (default: <parsed>.coverage.csv)")
+    parser.add_argument("--out", type=str, default="outputs/parse_coverage.csv", help="Output CSV path")
+    parser.add_argument("--verify", action="store_true", help="Re-read the exports (BeautifulSoup / json.load) and compare with the sidecar counts")
+    args = parser.parse_args()
+
+    root = Path(__file__).resolve().parents[1]
+    parsed_path = (root / args.parsed).resolve()
+    coverage_path = (root / args.coverage).resolve() if args.coverage else parsed_path.with_name(parsed_path.stem + ".coverage.csv")
+    out_path = (root / args.out).resolve()
 
-    rep = pd.DataFrame(rows).merge(groups_by_file, left_on="file", right_on="source_file", how="left")
-    rep = rep.drop(columns=["source_file"])
-    rep["parsed_groups"] = rep["parsed_groups"].fillna(0).astype(int)
+    if not parsed_path.exists():
+        raise FileNotFoundError(f"Parsed CSV not found: {parsed_path}")
+    if not coverage_path.exists():
+        raise FileNotFoundError(f"Coverage sidecar not found (re-run parse_telegram.py): {coverage_path}")
+
+    rep = pd.read_csv(coverage_path, encoding="utf-8-sig")
+
+    # parsed_groups follows the parsed CSV itself, so appended rows are counted too.
+    keys = ["channel", "source_file"] if "channel" in rep.columns else ["source_file"]
+    parsed = pd.read_csv(parsed_path, encoding="utf-8-sig", usecols=lambda c: c in keys)
+    if "channel" not in parsed.columns:
+        keys = ["source_file"]
+    groups_by_file = parsed.groupby(keys).size()
+    rep_keys = rep[["channel", "file"]] if len(keys) == 2 else rep[["file"]]
+    lookup = pd.MultiIndex.from_frame(rep_keys) if len(keys) == 2 else rep_keys["file"]
+    rep["parsed_groups"] = groups_by_file.reindex(lookup).fillna(0).astype(int).to_numpy()
     rep["default_per_group"] = (rep["html_default_messages"] / rep["groups_from_html"].clip(lower=1)).round(3)
-    rep["parsed_minus_html_groups"] = rep["parsed_groups"] - rep["groups_from_html"]
+    # Groups triaged as non-job sit in a separate CSV and reposts were folded into another
+    # row; both count as parsed, so a non-zero difference means groups were lost.
+    rep["parsed_minus_html_groups"] = (
+        rep["parsed_groups"] + rep["non_job_groups"] + rep["dropped_duplicates"] - rep["groups_from_html"]
+    )
+
+    if args.verify:
+        raw_dir = (root / args.raw_dir).resolve()
+        if not raw_dir.exists():
+            raise FileNotFoundError(f"Raw dir not found: {raw_dir}")
+        files = find_export_files(raw_dir, args.format)
+        if not files:
+            raise FileNotFoundError(f"No telegram export files ({args.format}) found in: {raw_dir}")
+
+        verified = verify_counts(files)
+        if "channel" in rep.columns:
+            verified["channel"] = args.channel or raw_dir.name
+            rep = rep.merge(verified, on=["channel", "file"], how="left")
+        else:
+            rep = rep.merge(verified, on="file", how="left")
+        rep["verified"] = (
+            (rep["verify_default_messages"] == rep["html_default_messages"])
+            & (rep["verify_joined_messages"] == rep["html_joined_messages"])
+            & (rep["verify_groups"] == rep["groups_from_html"])
+        )
 
     out_path.parent.mkdir(parents=True, exist_ok=True)
     rep.to_csv(out_path, index=False, encoding="utf-8-sig")
@@ -83,8 +163,12 @@ def main():
     print("Total default messages:", int(rep["html_default_messages"].sum()))
     print("Total groups from html:", int(rep["groups_from_html"].sum()))
     print("Total parsed groups:", int(rep["parsed_groups"].sum()))
+    print("Non-job groups:", int(rep["non_job_groups"].sum()))
+    print("Dropped duplicate groups:", int(rep["dropped_duplicates"].sum()))
+    print("Parse time (s):", round(float(rep["parse_seconds"].sum()), 2))
+    if args.verify:
+        print("Files matching --verify re-parse:", int(rep["verified"].sum()), "/", len(rep))
 
 
 if __name__ == "__main__":
     main()
-
@@ -46,6 +46,7 @@ def main():
     parser.add_argument("--skills", type=str, default="outputs/ads_with_skills.csv")
     parser.add_argument("--jobs", type=str, default="outputs/ads_with_job_titles.csv")
     parser.add_argument("--locs", type=str, default="outputs/ads_with_locations.csv")
+    parser.add_argument("--near-dups", type=str, default="outputs/ads_near_duplicates.csv", help="cluster_id per ad from near_duplicates.py (optional)")
     parser.add_argument("--out", type=str, default="outputs/ads_enriched.csv")
     args = parser.parse_args()
 
@@ -53,6 +54,7 @@ def main():
     skills_path = (root / args.skills).resolve()
     jobs_path = (root / args.jobs).resolve()
     locs_path = (root / args.locs).resolve()
+    near_dups_path = (root / args.near_dups).resolve()
     out_path = (root / args.out).resolve()
 
     if not skills_path.exists():
@@ -82,6 +84,15 @@ def main():
     out = df.merge(jobs[["_ad_key"] + job_extra_cols], on="_ad_key", how="left")
     out = out.merge(locs[["_ad_key"] + loc_extra_cols], on="_ad_key", how="left")
 
+    if near_dups_path.exists():
+        dups = pd.read_csv(near_dups_path, encoding="utf-8-sig")
+        dups["_ad_key"] = build_ad_key(dups)
+        dups = dedupe_on_key(dups, "_ad_key")
+        dup_cols = [c for c in ["cluster_id", "cluster_size", "is_cluster_head"] if c not in out.columns]
+        out = out.merge(dups[["_ad_key"] + dup_cols], on="_ad_key", how="left")
+    else:
+        print("Near-duplicate clusters not found (run near_duplicates.py):", near_dups_path)
+
     rename_map = {
         "خانواده_شغلی": "job_family_fa",
         "عنوان_شغل_استاندارد": "job_role_fa",
@@ -95,6 +106,8 @@ def main():
 
     print("Saved:", out_path)
     print("Rows:", len(out))
+    if "cluster_id" in out.columns:
+        print("Unique vacancies (near-duplicate clusters):", out["cluster_id"].nunique())
     print("Columns:", len(out.columns))
     print("Sample columns:", ", ".join(safe_cols(list(out.columns)[:25])) + (" ..." if len(out.columns) > 25 else ""))
 
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+from pathlib import Path
+import hashlib
+import os
+import pickle
+import re
+import sys
+
+from job_taxonomy import JOB_TITLE_PATTERNS
+from location_catalog import (
+    CITY_PATTERNS,
+    PROVINCES,
+    TEHRAN_DISTRICT_PATTERN,
+    TEHRAN_DISTRICT_WORD_PATTERN,
+    TEHRAN_DISTRICT_WORDS,
+    TEHRAN_NEIGHBORHOOD_PATTERNS,
+    TEHRAN_ZONE_PATTERNS,
+)
+from skill_matcher import compile_skill_matcher
+from skills_catalog import SKILL_PATTERNS
+
+
+# Bump when the bundle layout changes.
+BUNDLE_VERSION = 3
+# The catalogs and the code that compiles them; a change to any of them rebuilds the bundle.
+CATALOG_SOURCES = ["skills_catalog.py", "job_taxonomy.py", "location_catalog.py", "skill_matcher.py", "catalog_bundle.py"]
+DEFAULT_BUNDLE_PATH = Path(__file__).resolve().parents[1] / "outputs" / ".catalog_cache" / "catalog_bundle.pkl"
+BUNDLE_SECTIONS = ["skills", "skill_matcher", "jobs", "locations"]
+
+
+def catalog_hash() -> str:
+    h = hashlib.sha256(f"v{BUNDLE_VERSION} py{sys.version_info[0]}.{sys.version_info[1]}".encode("utf-8"))
+    src_dir = Path(__file__).resolve().parent
+    for name in CATALOG_SOURCES:
+        h.update(name.encode("utf-8"))
+        h.update((src_dir / name).read_bytes())
+    return h.hexdigest()
+
+
+def source_stats() -> list[list[int]]:
+    # (mtime, size) per source; when unchanged the stored hash is trusted without reading them.
+    src_dir = Path(__file__).resolve().parent
+    return [[st.st_mtime_ns, st.st_size] for st in ((src_dir / name).stat() for name in CATALOG_SOURCES)]
+
+
+def compile_skill_patterns() -> list[dict]:
+    compiled = []
+    for item in SKILL_PATTERNS:
+        compiled.append(
+            {
+                "skill": item["skill"],
+                "category": item.get("category", "unknown"),
+                "group": item.get("group", "hard"),
+                "parent": item.get("parent", None),
+                "regex": re.compile(item["pattern"], flags=re.IGNORECASE),
+                "pattern": item["pattern"],
+            }
+        )
+    return compiled
+
+
+def compile_job_patterns() -> list[dict]:
+    compiled = []
+    for it in JOB_TITLE_PATTERNS:
+        compiled.append({
+            "code": it["code"],
+            "family_fa": it["family_fa"],
+            "role_fa": it["role_fa"],
+            "regex": re.compile(it["pattern"], flags=re.IGNORECASE),
+        })
+    return compiled
+
+
+def compile_location_patterns() -> dict:
+    def rx(pattern: str) -> re.Pattern:
+        return re.compile(pattern, flags=re.IGNORECASE)
+
+    return {
+        "cities": [(rx(pat), prov, city) for pat, prov, city in CITY_PATTERNS],
+        "provinces": list(PROVINCES),
+        "district_re": rx(TEHRAN_DISTRICT_PATTERN),
+        "district_word_re": rx(TEHRAN_DISTRICT_WORD_PATTERN),
+        "district_words": dict(TEHRAN_DISTRICT_WORDS),
+        "zones": [(rx(pat), zone) for pat, zone in TEHRAN_ZONE_PATTERNS],
+        "neighborhoods": [(rx(pat), name) for pat, name in TEHRAN_NEIGHBORHOOD_PATTERNS],
+    }
+
+
+def build_catalog_bundle(digest: str) -> dict:
+    # Without the compiled "regex": only the --check-parity reference scan needs it.
+    skills = [{k: v for k, v in c.items() if k != "regex"} for c in compile_skill_patterns()]
+    return {
+        "version": BUNDLE_VERSION,
+        "hash": digest,
+        "skills": skills,
+        "skill_matcher": compile_skill_matcher(skills),
+        "jobs": compile_job_patterns(),
+        "locations": compile_location_patterns(),
+    }
+
+
+def load_catalog_bundle(path: Path = DEFAULT_BUNDLE_PATH, sections: list[str] | None = None) -> dict:
+    # The cached bundle when it was built from the current catalog sources, otherwise a
+    # fresh one (saved for the next stage). bundle["cached"] tells which.
+    # Each section is pickled on its own and only the requested ones (default: all) are
+    # loaded. The skill sections hold pattern sources, compiled by match_skills on use;
+    # the job and location sections hold re.Pattern objects, which unpickling compiles
+    # again, and every one of them is used by the stage that loads it.
+    path = Path(path)
+    sections = list(sections or BUNDLE_SECTIONS)
+    stats = source_stats()
+    if path.is_file():
+        try:
+            with open(path, "rb") as fh:
+                stored = pickle.load(fh)
+            if stored.get("version") == BUNDLE_VERSION:
+                digest = stored["hash"] if stored.get("stats") == stats else catalog_hash()
+                if stored["hash"] == digest:
+                    bundle = {name: pickle.loads(stored["sections"][name]) for name in sections}
+                    bundle.update(version=BUNDLE_VERSION, hash=digest, cached=True)
+                    return bundle
+        except (OSError, EOFError, AttributeError, ImportError, KeyError, ValueError, pickle.UnpicklingError):
+            pass
+
+    digest = catalog_hash()
+    built = build_catalog_bundle(digest)
+    stored = {
+        "version": BUNDLE_VERSION,
+        "hash": digest,
+        "stats": stats,
+        "sections": {name: pickle.dumps(built[name], protocol=pickle.HIGHEST_PROTOCOL) for name in BUNDLE_SECTIONS},
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as fh:
+        pickle.dump(stored, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+    bundle = {name: built[name] for name in sections}
+    bundle.update(version=BUNDLE_VERSION, hash=digest, cached=False)
+    return bundle
+
+
+def describe_bundle(bundle: dict) -> str:
+    return f"catalog bundle {bundle['hash'][:12]} ({'cached' if bundle['cached'] else 'rebuilt'})"
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# Experience is read only near its keywords: windows of EXP_WINDOW_CHARS around each anchor
+# (zero-experience words included), never from "N سال" elsewhere in the ad. Anchors are
+# matched case-sensitively on lowercased text, which keeps the literal scan fast.
+EXP_ANCHOR_RE = re.compile(r"سابقه|تجربه|experience|junior|intern|کارآموز")
+EXP_WINDOW_CHARS = 40
+EXP_WINDOW_SEP = " ¦ "
+
+# A phrase cut by a window edge is pulled in whole: the window grows to token boundaries,
+# then over a "2 تا" / "حداقل" head just before it and a "تا 12 سال" tail just after it.
+EXP_HEAD_RE = re.compile(r"(?:\d{1,2}\s*(?:تا|الی|—|–|-)|حداقل|min)\s*$")
+EXP_TAIL_RE = re.compile(r"\s*(?:(?:تا|الی|—|–|-)\s*)?(?:\d{1,2}\s*)?سال")
+EXP_HEAD_CHARS = 16
+
+# One pattern for all forms; the group that matched gives the kind. Per ad the first match
+# of the best kind wins: zero > range > min > single.
+EXP_RE = (
+    r"(?P<zero>بدون\s*سابقه|junior|intern|کارآموز)"
+    r"|(?P<range_a>\d{1,2})\s*(?:تا|الی|—|–|-)\s*(?P<range_b>\d{1,2})\s*سال"
+    r"|(?:حداقل|min)\s*(?P<min_a>\d{1,2})\s*سال"
+    r"|(?P<single_a>\d{1,2})\s*سال(?:\s*سابقه)?"
+)
+EXP_KINDS = ["zero", "range_a", "min_a", "single_a"]
+
+
+def widen_window(text: str, lo: int, hi: int) -> tuple[int, int]:
+    # text is normalized, so tokens are separated by single spaces.
+    hi = min(hi, len(text))
+    if lo > 0 and text[lo - 1] != " ":
+        lo = text.rfind(" ", 0, lo) + 1
+    head = EXP_HEAD_RE.search(text, max(0, lo - EXP_HEAD_CHARS), lo) if lo > 0 else None
+    if head:
+        lo = text.rfind(" ", 0, head.start()) + 1
+    if hi < len(text) and text[hi - 1] != " ":
+        end = text.find(" ", hi)
+        hi = len(text) if end < 0 else end
+    tail = EXP_TAIL_RE.match(text, hi)
+    if tail:
+        hi = tail.end()
+    return lo, hi
+
+
+def experience_windows(text: str) -> str:
+    # Merged anchor windows of one ad, joined by a separator no pattern can match across.
+    spans: list[list[int]] = []
+    for m in EXP_ANCHOR_RE.finditer(text):
+        lo, hi = widen_window(text, max(0, m.start() - EXP_WINDOW_CHARS), m.end() + EXP_WINDOW_CHARS)
+        if spans and lo <= spans[-1][1]:
+            spans[-1][0] = min(spans[-1][0], lo)
+            spans[-1][1] = max(spans[-1][1], hi)
+        else:
+            spans.append([lo, hi])
+    return EXP_WINDOW_SEP.join(text[lo:hi] for lo, hi in spans)
+
+
+def extract_experience_years(experience: pd.Series, text_norm: pd.Series) -> pd.DataFrame:
+    # exp_min_years / exp_max_years per ad from the (normalized) experience field, which is
+    # read whole, plus the keyword windows of text_norm, with one extractall over all of it.
+    windows = text_norm.fillna("").astype(str).str.lower().map(experience_windows)
+    source = (experience.fillna("").astype(str) + EXP_WINDOW_SEP + windows).str.strip()
+    hits = source.str.extractall(EXP_RE, flags=re.IGNORECASE)
+
+    out = pd.DataFrame({"exp_min_years": np.nan, "exp_max_years": np.nan}, index=experience.index)
+    if hits.empty:
+        return out
+
+    hits["kind"] = np.select([hits[k].notna().to_numpy() for k in EXP_KINDS], range(len(EXP_KINDS)))
+    hits["ad"] = hits.index.get_level_values(0)
+    best = hits.sort_values(["ad", "kind"], kind="stable").groupby("ad", sort=False).head(1).set_index("ad")
+
+    lo = pd.to_numeric(best["range_a"].fillna(best["min_a"]).fillna(best["single_a"]), errors="coerce")
+    lo = lo.where(best["kind"].ne(0), 0.0)
+    hi = pd.to_numeric(best["range_b"], errors="coerce").where(best["kind"].ne(0), 0.0)
+    out.loc[best.index, "exp_min_years"] = lo.astype(float)
+    out.loc[best.index, "exp_max_years"] = hi.astype(float)
+    return out
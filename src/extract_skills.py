@@ -1,144 +1,178 @@
 from __future__ import annotations
 
 from pathlib import Path
+import argparse
 import re
-import html as htmllib
+import numpy as np
 import pandas as pd
 
-from skills_catalog import SKILL_PATTERNS
+from build_dataset import build_ad_key
+from catalog_bundle import describe_bundle, load_catalog_bundle
+from experience_years import extract_experience_years
 from labels_fa import skill_label_fa
-
-
-PERSIAN_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹", "0123456789")
-ARABIC_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩", "0123456789")
-ARABIC_LETTERS = str.maketrans({"ي": "ی", "ك": "ک", "ة": "ه", "ۀ": "ه", "ؤ": "و", "إ": "ا", "أ": "ا"})
-
-
-def normalize_text(s: str) -> str:
-    s = htmllib.unescape(s or "")
-    s = s.translate(ARABIC_LETTERS).translate(PERSIAN_DIGITS).translate(ARABIC_DIGITS)
-    s = s.replace("\u200c", " ")
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
-
-
-
-EXP_RANGE_RE = re.compile(r"(?P<a>\d{1,2})\s*(?:تا|الی|—|–|-)\s*(?P<b>\d{1,2})\s*سال")
-EXP_MIN_RE = re.compile(r"(?:حداقل|min)\s*(?P<a>\d{1,2})\s*سال", re.IGNORECASE)
-EXP_SINGLE_RE = re.compile(r"(?P<a>\d{1,2})\s*سال(?:\s*سابقه)?")
-EXP_ZERO_RE = re.compile(r"بدون\s*سابقه|junior|intern|کارآموز", re.IGNORECASE)
-
-
-def parse_experience_years(text: str) -> tuple[float | None, float | None]:
-   
-    t = normalize_text(text or "")
-
-    if EXP_ZERO_RE.search(t):
-        return 0.0, 0.0
-
-    m = EXP_RANGE_RE.search(t)
-    if m:
-        return float(m.group("a")), float(m.group("b"))
-
-    m = EXP_MIN_RE.search(t)
-    if m:
-        return float(m.group("a")), None
-
-    m = EXP_SINGLE_RE.search(t)
-    if m:
-        return float(m.group("a")), None
-
-    return None, None
-
-
-def compile_patterns():
-    compiled = []
-    for item in SKILL_PATTERNS:
-        compiled.append(
-            {
-                "skill": item["skill"],
-                "category": item.get("category", "unknown"),
-                "group": item.get("group", "hard"),
-                "parent": item.get("parent", None),
-                "regex": re.compile(item["pattern"], flags=re.IGNORECASE),
-                "pattern": item["pattern"],
-            }
-        )
-    return compiled
+from multilabel_codec import encode_labels
+from parsed_store import load_cluster_ids
+from skill_matcher import match_skills
+from skill_matrix_store import save_skill_matrices, to_csr
+from skill_span_index import build_span_index, save_span_index
+from text_normalize import normalize_series, report_normalize_calls
+
+
+def compile_hierarchy(compiled) -> dict:
+    # The `parent` links, all levels, as an ancestor matrix over nodes = catalog skills +
+    # parents missing from the catalog: ancestors[i, j] = 1 if node j is an ancestor of skill i.
+    skills = [c["skill"] for c in compiled]
+    parent_of = {c["skill"]: c["parent"] for c in compiled if c.get("parent")}
+    parents = list(dict.fromkeys(parent_of.values()))
+    nodes = skills + [p for p in parents if p not in skills]
+    node_idx = {n: i for i, n in enumerate(nodes)}
+
+    ancestors = np.zeros((len(skills), len(nodes)), dtype=np.float32)
+    for i, n in enumerate(skills):
+        chain, p = [], parent_of.get(n)
+        while p is not None:
+            if p == n or p in chain:
+                raise ValueError(f"Cycle in skill parents at {n}")
+            chain.append(p)
+            p = parent_of.get(p)
+        ancestors[i, [node_idx[a] for a in chain]] = 1
+
+    return {
+        "nodes": nodes,
+        "ancestors": ancestors,
+        "parents": parents,
+        "parent_idx": np.array([node_idx[p] for p in parents], dtype=np.int64),
+    }
+
+
+def resolve_hierarchy(skill_matrix: pd.DataFrame, hierarchy: dict) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # One matrix product marks, per ad, every node with a matching descendant at any depth.
+    # Such skills are dropped (the specific skill wins), and each parent column of the
+    # roll-up is its own hit or any descendant hit.
+    hits = skill_matrix.to_numpy(dtype=bool)
+    has_descendant = (hits.astype(np.float32) @ hierarchy["ancestors"]) > 0
+
+    n_skills = hits.shape[1]
+    suppressed = pd.DataFrame(hits & ~has_descendant[:, :n_skills], index=skill_matrix.index, columns=skill_matrix.columns)
+    has_descendant[:, :n_skills] |= hits
+    rolled = has_descendant[:, hierarchy["parent_idx"]]
+    return suppressed, pd.DataFrame(rolled, index=skill_matrix.index, columns=hierarchy["parents"])
+
+
+def skill_vacancy_counts(skill_matrix: pd.DataFrame, clusters: pd.Series) -> pd.Series:
+    # Distinct near-duplicate clusters (vacancies) among the ads hitting each skill.
+    indptr, indices = to_csr(skill_matrix)
+    cluster_codes, cluster_values = pd.factorize(clusters)
+    n_clusters = max(len(cluster_values), 1)
+    hit_clusters = np.repeat(cluster_codes.astype(np.int64), np.diff(indptr))
+    hit_skills = np.unique(indices.astype(np.int64) * n_clusters + hit_clusters) // n_clusters
+    return pd.Series(np.bincount(hit_skills, minlength=skill_matrix.shape[1]), index=skill_matrix.columns)
+
+
+def title_skill_counts(skill_matrix: pd.DataFrame, titles: pd.Series, clusters: pd.Series) -> pd.DataFrame:
+    # (job_title_norm, skill, n_ads, n_vacancies) for every pair with hits, ordered like a
+    # groupby on both keys (missing titles dropped); n_vacancies counts distinct clusters.
+    # Works on the sparse hits, so memory grows with the number of hits rather than ads x skills.
+    indptr, indices = to_csr(skill_matrix)
+    title_codes, title_values = pd.factorize(titles, sort=True)
+    skills = np.asarray(skill_matrix.columns, dtype=object)
+    skill_order = np.argsort(skills, kind="stable")
+    skill_rank = np.empty(len(skills), dtype=np.int64)
+    skill_rank[skill_order] = np.arange(len(skills))
+
+    cluster_codes, cluster_values = pd.factorize(clusters)
+    n_clusters = max(len(cluster_values), 1)
+
+    hit_titles = np.repeat(title_codes, np.diff(indptr))
+    hit_clusters = np.repeat(cluster_codes.astype(np.int64), np.diff(indptr))
+    keep = hit_titles >= 0
+    all_pairs = hit_titles[keep].astype(np.int64) * len(skills) + skill_rank[indices[keep]]
+    pairs, n_ads = np.unique(all_pairs, return_counts=True)
+    # Distinct (pair, cluster) keys come out sorted by pair, so their counts line up with pairs.
+    _, n_vacancies = np.unique(np.unique(all_pairs * n_clusters + hit_clusters[keep]) // n_clusters, return_counts=True)
+    return pd.DataFrame({
+        "job_title_norm": np.asarray(title_values, dtype=object)[pairs // len(skills)],
+        "skill": skills[skill_order][pairs % len(skills)],
+        "n_ads": n_ads,
+        "n_vacancies": n_vacancies,
+    })
+
+
+def check_matcher_parity(skill_matrix: pd.DataFrame, text_series: pd.Series, compiled) -> None:
+    # The old per-pattern scan, one str.contains per skill, as the reference.
+    reference = pd.DataFrame({c["skill"]: text_series.str.contains(c["pattern"], flags=re.IGNORECASE, na=False) for c in compiled}, index=text_series.index)
+    diff = (reference != skill_matrix).sum(axis=0)
+    diff = diff[diff > 0]
+    if len(diff):
+        raise ValueError(f"Skill matcher differs from per-pattern regex for: {diff.to_dict()}")
+    print(f" Parity check: skill matrix matches per-pattern regex ({reference.shape[0]} ads x {reference.shape[1]} skills)")
 
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--check-parity", action="store_true", help="Also run the per-pattern regex scan and require an identical skill matrix")
+    parser.add_argument("--near-dups", type=str, default="outputs/ads_near_duplicates.csv", help="cluster_id per ad from near_duplicates.py; without it every ad counts as its own vacancy")
+    args = parser.parse_args()
+
     root = Path(__file__).resolve().parents[1]
     in_csv = root / "outputs" / "ads_parsed_all.csv"
 
     out_ads = root / "outputs" / "ads_with_skills.csv"
     out_counts = root / "outputs" / "skills_counts.csv"
     out_job_counts = root / "outputs" / "job_skill_counts.csv"
+    out_matrix = root / "outputs" / "ads_skill_matrix.npz"
+    out_spans = root / "outputs" / "ads_skill_spans.npz"
 
     df = pd.read_csv(in_csv, encoding="utf-8-sig")
+    cluster_ids = load_cluster_ids((root / args.near_dups).resolve(), df)
 
     if "text_norm" not in df.columns:
-        df["text_norm"] = df["text_raw"].fillna("").map(normalize_text)
+        df["text_norm"] = normalize_series(df["text_raw"])
 
     if "job_title_norm" not in df.columns:
-        df["job_title_norm"] = df["job_title"].fillna("").map(normalize_text)
+        df["job_title_norm"] = normalize_series(df["job_title"])
 
     
-    exp_col = df["experience"].fillna("").astype(str) if "experience" in df.columns else pd.Series([""] * len(df))
-    exp_source = (exp_col + " " + df["text_norm"].fillna("")).astype(str)
-
-    exp_parsed = exp_source.map(parse_experience_years)
-    df["exp_min_years"] = exp_parsed.map(lambda x: x[0])
-    df["exp_max_years"] = exp_parsed.map(lambda x: x[1])
+    # Only the short experience field is normalized here; text_norm is reused as is.
+    exp_col = normalize_series(df["experience"]) if "experience" in df.columns else pd.Series([""] * len(df), index=df.index)
+    exp_years = extract_experience_years(exp_col, df["text_norm"])
+    df["exp_min_years"] = exp_years["exp_min_years"]
+    df["exp_max_years"] = exp_years["exp_max_years"]
 
-    compiled = compile_patterns()
+    catalog = load_catalog_bundle(sections=["skills", "skill_matcher"])
+    compiled = catalog["skills"]
+    print(f" Skills from {describe_bundle(catalog)}")
 
     
-    skill_matrix = pd.DataFrame(index=df.index)
     text_series = df["text_norm"].fillna("")
-
-    for c in compiled:
-        skill_matrix[c["skill"]] = text_series.str.contains(c["regex"], na=False)
+    skill_matrix, found_spans = match_skills(catalog["skill_matcher"], text_series, spans=True)
+    if args.check_parity:
+        check_matcher_parity(skill_matrix, text_series, compiled)
+    # Where each raw hit matched, before parents are suppressed by their children.
+    spans = build_span_index(found_spans, len(df), skill_matrix.shape[1])
 
     
-    children_by_parent: dict[str, list[str]] = {}
-    for c in compiled:
-        p = c.get("parent")
-        if p:
-            children_by_parent.setdefault(p, []).append(c["skill"])
-
-    for p, kids in children_by_parent.items():
-        if p in skill_matrix.columns:
-            skill_matrix[p] = skill_matrix[p] & (~skill_matrix[kids].any(axis=1))
+    hierarchy = compile_hierarchy(compiled)
+    skill_matrix, parent_matrix = resolve_hierarchy(skill_matrix, hierarchy)
 
     
-    df["skills_extracted"] = skill_matrix.apply(
-        lambda row: "|".join([s for s, v in row.items() if bool(v)]),
-        axis=1,
-    )
+    df["skills_extracted"] = encode_labels(skill_matrix)
 
     
     fine_skills = [c["skill"] for c in compiled if c.get("parent")]
     if fine_skills:
-        df["skills_extracted_fine"] = skill_matrix[fine_skills].apply(
-            lambda row: "|".join([s for s, v in row.items() if bool(v)]),
-            axis=1,
-        )
+        df["skills_extracted_fine"] = encode_labels(skill_matrix[fine_skills])
     else:
         df["skills_extracted_fine"] = ""
 
+    matrices = {"skills_extracted": skill_matrix}
+    if fine_skills:
+        matrices["skills_extracted_fine"] = skill_matrix[fine_skills]
+
     
-    if children_by_parent:
-        parent_hits = {}
-        for p, kids in children_by_parent.items():
-            base = skill_matrix[p] if p in skill_matrix.columns else False
-            kid_any = skill_matrix[kids].any(axis=1)
-            parent_hits[p] = (base | kid_any)
-
-        df["skills_extracted_parents"] = pd.DataFrame(parent_hits).apply(
-            lambda row: "|".join([s for s, v in row.items() if bool(v)]),
-            axis=1,
-        )
+    if hierarchy["parents"]:
+        matrices["skills_extracted_parents"] = parent_matrix
+        df["skills_extracted_parents"] = encode_labels(parent_matrix)
     else:
         df["skills_extracted_parents"] = ""
 
@@ -159,20 +193,13 @@ def main():
     overall_counts["category"] = overall_counts["skill"].map(cat_map)
     overall_counts["group"] = overall_counts["skill"].map(group_map)
     overall_counts["parent"] = overall_counts["skill"].map(parent_map)
+    overall_counts["n_vacancies"] = overall_counts["skill"].map(skill_vacancy_counts(skill_matrix, cluster_ids))
     overall_counts_with_fa = overall_counts.copy()
     overall_counts_with_fa["skill_fa"] = overall_counts_with_fa["skill"].map(skill_label_fa)
 
     
-    long_df = (
-        skill_matrix.assign(job_title_norm=df["job_title_norm"])
-        .melt(id_vars=["job_title_norm"], var_name="skill", value_name="has_skill")
-    )
-
     job_skill_counts = (
-        long_df[long_df["has_skill"]]
-        .groupby(["job_title_norm", "skill"], as_index=False)
-        .size()
-        .rename(columns={"size": "n_ads"})
+        title_skill_counts(skill_matrix, df["job_title_norm"], cluster_ids)
         .sort_values(["job_title_norm", "n_ads"], ascending=[True, False])
     )
     job_skill_counts_with_fa = job_skill_counts.copy()
@@ -185,10 +212,16 @@ def main():
     overall_counts_with_fa.to_csv(out_counts.with_name("skills_counts_with_fa.csv"), index=False, encoding="utf-8-sig")
     job_skill_counts.to_csv(out_job_counts, index=False, encoding="utf-8-sig")
     job_skill_counts_with_fa.to_csv(out_job_counts.with_name("job_skill_counts_with_fa.csv"), index=False, encoding="utf-8-sig")
+    skill_meta = pd.DataFrame({"skill": list(cat_map), "category": list(cat_map.values()), "group": list(group_map.values()), "parent": list(parent_map.values())})
+    save_skill_matrices(out_matrix, matrices, build_ad_key(df), skill_meta)
+    save_span_index(out_spans, spans, build_ad_key(df), list(skill_matrix.columns))
 
     print(f" ads_with_skills saved: {out_ads}")
     print(f" skills_counts saved: {out_counts}")
     print(f" job_skill_counts saved: {out_job_counts}")
+    print(f" skill matrix saved: {out_matrix} ({int(skill_matrix.to_numpy().sum())} ad-skill pairs)")
+    print(f" skill spans saved: {out_spans} ({len(spans['ad'])} spans)")
+    report_normalize_calls("extract_skills")
 
     print("\nTop 20 skills:")
     print(overall_counts.head(20).to_string(index=False))
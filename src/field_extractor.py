@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import re
+
+
+# Keys per field, in priority order (first key with a usable value wins).
+FIELD_KEYS: dict[str, list[str]] = {
+    "company": ["نام شرکت", "شرکت", "نام‌شرکت", "فعالیت"],
+    "location": ["شهرستان و محدوده مکانی", "شهرستان", "شهر", "محل فعالیت"],
+    "education": ["مدرک تحصیلی", "تحصیلات"],
+    "experience": ["سابقه فعالیت", "سابقه کار", "سابقه کاری", "سابقه"],
+}
+
+VALUE_RE = re.compile(r"\s*[:：]?\s*(.+)")
+
+
+def compile_field_extractor(field_keys: dict[str, list[str]] | None = None) -> dict:
+    field_keys = field_keys or FIELD_KEYS
+    keys = sorted({k for ks in field_keys.values() for k in ks}, key=len, reverse=True)
+
+    # Zero-width scan reports every start position of a key, overlapping ones included.
+    # At one position the longest key wins; shorter keys there are exactly its prefixes.
+    scan = re.compile("(?=(" + "|".join(re.escape(k) for k in keys) + "))")
+    prefixes = {k: [p for p in keys if k.startswith(p)] for k in keys}
+
+    return {"fields": field_keys, "scan": scan, "prefixes": prefixes}
+
+
+FIELD_EXTRACTOR = compile_field_extractor()
+
+
+def find_keys(text: str, extractor: dict | None = None) -> dict[str, list[int]]:
+    extractor = extractor or FIELD_EXTRACTOR
+    prefixes = extractor["prefixes"]
+    positions: dict[str, list[int]] = {}
+    for m in extractor["scan"].finditer(text):
+        for k in prefixes[m.group(1)]:
+            positions.setdefault(k, []).append(m.start())
+    return positions
+
+
+def extract_fields(text: str, extractor: dict | None = None) -> dict[str, str | None]:
+    # Per field, the rest of the line after the first of its keys (in priority order) that
+    # occurs in the text, e.g. "شهر: تهران" -> "تهران". One scan finds every key.
+    extractor = extractor or FIELD_EXTRACTOR
+    text = text or ""
+    positions = find_keys(text, extractor)
+
+    out: dict[str, str | None] = {}
+    for field, keys in extractor["fields"].items():
+        value = None
+        for k in keys:
+            for pos in positions.get(k, ()):
+                m = VALUE_RE.match(text, pos + len(k))
+                if m:
+                    value = m.group(1).strip().split("\n")[0].strip()
+                    break
+            if value is not None:
+                break
+        out[field] = value
+    return out
@@ -0,0 +1,190 @@
+# src/location_catalog.py
+# Keep comments and docstrings in English only.
+# Patterns are matched case-insensitively on normalize_text(..., "location") output;
+# catalog_bundle compiles them.
+
+CITY_PATTERNS = [
+    (r"\btehran\b|تهران", "تهران", "تهران"),
+    (r"\bkaraj\b|کرج", "البرز", "کرج"),
+    (r"\bmashhad\b|مشهد", "خراسان رضوی", "مشهد"),
+    (r"\bisfahan\b|اصفهان", "اصفهان", "اصفهان"),
+    (r"\bshiraz\b|شیراز", "فارس", "شیراز"),
+    (r"\btabriz\b|تبریز", "آذربایجان شرقی", "تبریز"),
+    (r"\bahvaz\b|اهواز", "خوزستان", "اهواز"),
+    (r"\brasht\b|رشت", "گیلان", "رشت"),
+    (r"\bsari\b|ساری", "مازندران", "ساری"),
+    (r"\bqom\b|قم", "قم", "قم"),
+    (r"\bqazvin\b|قزوین", "قزوین", "قزوین"),
+    (r"\byazd\b|یزد", "یزد", "یزد"),
+    (r"\bkerman\b|کرمان", "کرمان", "کرمان"),
+    (r"\bbandar\s*abbas\b|بندر\s*عباس", "هرمزگان", "بندرعباس"),
+    (r"\bkermanshah\b|کرمانشاه", "کرمانشاه", "کرمانشاه"),
+    (r"\bhamadan\b|همدان", "همدان", "همدان"),
+    (r"\barak\b|اراک", "مرکزی", "اراک"),
+    (r"\burmia\b|ارومیه|اورمیه", "آذربایجان غربی", "ارومیه"),
+    (r"\bgorgan\b|گرگان", "گلستان", "گرگان"),
+    (r"\bzahedan\b|زاهدان", "سیستان و بلوچستان", "زاهدان"),
+    (r"\bsanandaj\b|سنندج", "کردستان", "سنندج"),
+    (r"\bardabil\b|اردبیل", "اردبیل", "اردبیل"),
+    (r"\bzanjan\b|زنجان", "زنجان", "زنجان"),
+    (r"\bkhorramabad\b|خرم\s*آباد|خرماباد", "لرستان", "خرم‌آباد"),
+    (r"\bbushehr\b|بوشهر", "بوشهر", "بوشهر"),
+    (r"\bshahrekord\b|شهرکرد", "چهارمحال و بختیاری", "شهرکرد"),
+    (r"\byasuj\b|یاسوج", "کهگیلویه و بویراحمد", "یاسوج"),
+    (r"\bilam\b|ایلام", "ایلام", "ایلام"),
+    (r"\bsemnan\b|سمنان", "سمنان", "سمنان"),
+    (r"\bbirjand\b|بیرجند", "خراسان جنوبی", "بیرجند"),
+    (r"\bbojnurd\b|بجنورد", "خراسان شمالی", "بجنورد"),
+]
+
+PROVINCES = [
+    "تهران","البرز","اصفهان","فارس","خراسان رضوی","خوزستان","آذربایجان شرقی","آذربایجان غربی",
+    "کرمان","گیلان","مازندران","قم","قزوین","یزد","کرمانشاه","گلستان","هرمزگان","مرکزی","همدان",
+    "سیستان و بلوچستان","کردستان","زنجان","لرستان","بوشهر","چهارمحال و بختیاری","کهگیلویه و بویراحمد",
+    "ایلام","اردبیل","خراسان جنوبی","خراسان شمالی","سمنان"
+]
+
+TEHRAN_DISTRICT_PATTERN = r"(?:منطقه|ناحیه)\s*([0-9]{1,2})"
+
+TEHRAN_DISTRICT_WORDS: dict[str, int] = {
+    "یک": 1,
+    "يک": 1,
+    "اول": 1,
+    "دو": 2,
+    "دوم": 2,
+    "سه": 3,
+    "سوم": 3,
+    "چهار": 4,
+    "چهارم": 4,
+    "پنج": 5,
+    "پنجم": 5,
+    "شش": 6,
+    "ششم": 6,
+    "هفت": 7,
+    "هفتم": 7,
+    "هشت": 8,
+    "هشتم": 8,
+    "نه": 9,
+    "نهم": 9,
+    "ده": 10,
+    "دهم": 10,
+    "یازده": 11,
+    "يازده": 11,
+    "یازدهم": 11,
+    "دوازده": 12,
+    "دوازدهم": 12,
+    "سیزده": 13,
+    "سیزدهم": 13,
+    "چهارده": 14,
+    "چهاردهم": 14,
+    "پانزده": 15,
+    "پانزدهم": 15,
+    "شانزده": 16,
+    "شانزدهم": 16,
+    "هفده": 17,
+    "هفدهم": 17,
+    "هجده": 18,
+    "هجدهم": 18,
+    "نوزده": 19,
+    "نوزدهم": 19,
+    "بیست": 20,
+    "بیستم": 20,
+    "بیست و یک": 21,
+    "بیست‌ویک": 21,
+    "بیست و دو": 22,
+    "بیست‌ودو": 22,
+}
+
+TEHRAN_DISTRICT_WORD_PATTERN = (
+    r"(?:منطقه|ناحیه)\s*(?:شماره\s*)?("
+    r"بیست\s*[\u200c ]*\s*دو|بیست\s*[\u200c ]*\s*یک|"
+    r"یازده|يازده|دوازده|سیزده|چهارده|پانزده|شانزده|هفده|هجده|نوزده|"
+    r"ده|نه|هشت|هفت|شش|پنج|چهار|سه|دو|یک|يک|"
+    r"بیست|"
+    r"اول|دوم|سوم|چهارم|پنجم|ششم|هفتم|هشتم|نهم|دهم|"
+    r"یازدهم|دوازدهم|سیزدهم|چهاردهم|پانزدهم|شانزدهم|هفدهم|هجدهم|نوزدهم|بیستم"
+    r")"
+)
+
+TEHRAN_ZONE_PATTERNS = [
+    (r"شمال\s*تهران", "تهران-شمال"),
+    (r"غرب\s*تهران", "تهران-غرب"),
+    (r"شرق\s*تهران", "تهران-شرق"),
+    (r"جنوب\s*تهران", "تهران-جنوب"),
+    (r"(?:مرکز\s*تهران|تهران\s*مرکز)", "تهران-مرکز"),
+]
+
+
+TEHRAN_NEIGHBORHOOD_PATTERNS = [
+    
+    (r"تجریش|tajrish", "تجریش"),
+    (r"زعفرانیه|zaferanieh", "زعفرانیه"),
+    (r"ولنجک|velenjak", "ولنجک"),
+    (r"نیاوران|niavaran", "نیاوران"),
+    (r"فرمانیه|farmanieh", "فرمانیه"),
+    (r"قیطریه|qeytarieh", "قیطریه"),
+    (r"الهیه|elahiyeh", "الهیه"),
+    (r"اقدسیه|aghdasieh", "اقدسیه"),
+    (r"کامرانیه|kamaraniyeh", "کامرانیه"),
+    (r"اوین|evin", "اوین"),
+    (r"جماران|jamaran", "جماران"),
+    (r"دربند|darband", "دربند"),
+    (r"درکه|darkeh", "درکه"),
+    (r"پاسداران|pasdaran", "پاسداران"),
+    (r"هروی|heravi", "هروی"),
+
+    
+    (r"ونک|vanak|میدان\s*ونک", "ونک"),
+    (r"میرداماد|mirdamad", "میرداماد"),
+    (r"سهروردی|sohravardi", "سهروردی"),
+    (r"عباس\s*آباد|abbas\s*abad", "عباس‌آباد"),
+    (r"بهشتی|beheshti|خیابان\s*بهشتی", "بهشتی"),
+    (r"مطهری|motahari|خیابان\s*مطهری", "مطهری"),
+    (r"شریعتی|shariati", "شریعتی"),
+    (r"یوسف\s*آباد|yousef\s*abad", "یوسف‌آباد"),
+    (r"امیر\s*آباد|amir\s*abad", "امیرآباد"),
+    (r"گیشا|kuy\s*nasr|کوی\s*نصر", "گیشا/کوی نصر"),
+    (r"فاطمی|fatemi|میدان\s*فاطمی", "فاطمی"),
+    (r"آرژانتین|argentina|میدان\s*آرژانتین", "آرژانتین"),
+    (r"جردن|نلسون\s*ماندلا|jordan", "جردن/نلسون ماندلا"),
+
+    
+    (r"ولیعصر|valiasr|ولی\s*عصر", "ولیعصر"),
+    (r"انقلاب|enghelab|میدان\s*انقلاب", "انقلاب"),
+    (r"هفت\s*تیر|haft\s*tir|میدان\s*هفت\s*تیر", "هفت‌تیر"),
+    (r"فردوسی|ferdowsi|میدان\s*فردوسی", "فردوسی"),
+    (r"جمهوری|jomhouri", "جمهوری"),
+    (r"توحید|tوحید|tوحيد", "توحید"),
+
+
+    (r"سعادت\s*آباد|saadat\s*abad|saadatabad", "سعادت‌آباد"),
+    (r"شهرک\s*غرب|shahrak\s*gharb|shahrake\s*gharb", "شهرک غرب"),
+    (r"مرزداران|marzdaran", "مرزداران"),
+    (r"پونک|punak|ponak", "پونک"),
+    (r"صادقیه|sadeghieh|sadeghiyeh", "صادقیه"),
+    (r"آریاشهر|aria\s*shahr", "آریاشهر"),
+    (r"ستارخان|setareh\s*khan", "ستارخان"),
+    (r"جنت\s*آباد|janat\s*abad|jannat\s*abad", "جنت‌آباد"),
+    (r"چیتگر|chitgar", "چیتگر"),
+    (r"اکباتان|ekbatan", "اکباتان"),
+    (r"تهرانسر|tehran\s*sar", "تهرانسر"),
+
+    
+    (r"تهران\s*پارس|tehran\s*pars|tehranpars", "تهرانپارس"),
+    (r"نارمک|narmak", "نارمک"),
+    (r"مجیدیه|majidieh", "مجیدیه"),
+    (r"رسالت|resalat", "رسالت"),
+    (r"حکیمیه|hakimiyeh", "حکیمیه"),
+    (r"پیروزی|pirouzi", "پیروزی"),
+
+    
+    # City Rey: keep strict to avoid false positives.
+    # Key pitfall: do NOT match across words like "گذاری شهرستان" -> "...ری شهر..." (false Rey).
+    (
+        r"(?:^|[\s,،/\-()\[\]{}:؛;])(?:شهر\s*ری|شهرری|شهرستان\s*ری|shahr\s*rey)(?=$|[\s,،/\-()\[\]{}:؛;])",
+        "شهرری",
+    ),
+    (r"نازی\s*آباد|nazi\s*abad", "نازی‌آباد"),
+    (r"شوش|shoosh", "شوش"),
+    (r"راه\s*آهن|railway", "راه‌آهن"),
+]
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+
+# Multi-label cells such as skills_extracted are labels joined with "|", in column order.
+LABEL_SEP = "|"
+MISSING_MARKERS = ["", "nan", "none"]
+
+
+def encode_labels(matrix: pd.DataFrame, sep: str = LABEL_SEP) -> pd.Series:
+    # Boolean row x label frame -> one joined string per row ("" for rows without labels).
+    rows, cols = np.nonzero(matrix.to_numpy(dtype=bool))
+    out = np.full(len(matrix), "", dtype=object)
+    if len(rows):
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = rows[1:] != rows[:-1]
+        labels = np.asarray([str(c) for c in matrix.columns], dtype=object)[cols]
+        pieces = np.where(first, labels, sep + labels)
+        starts = np.flatnonzero(first)
+        out[rows[starts]] = np.add.reduceat(pieces, starts)
+    return pd.Series(out, index=matrix.index)
+
+
+def decode_labels(values: pd.Series, sep: str = LABEL_SEP) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Joined strings -> (offsets, codes, vocab): the labels of row i are
+    # vocab[codes[offsets[i]:offsets[i + 1]]]. Labels are stripped, empty ones dropped, and
+    # "nan"/"none" cells count as empty. One split over the whole column instead of one per
+    # row; stripping and the missing check run on the distinct tokens only.
+    cells = values.fillna("").astype(str).tolist()
+    n_parts = np.fromiter((c.count(sep) + 1 for c in cells), dtype=np.int64, count=len(cells))
+    raw_codes, raw_vocab = pd.factorize(pd.Series(sep.join(cells).split(sep), dtype=object), sort=False)
+
+    stripped = pd.Series(raw_vocab, dtype=object).str.strip()
+    label_codes, vocab = pd.factorize(stripped.where(stripped.ne(""), None), sort=False)
+    codes = label_codes[raw_codes]
+
+    row = np.repeat(np.arange(len(cells)), n_parts)
+    keep = codes >= 0
+    missing = stripped.str.lower().isin(MISSING_MARKERS).to_numpy()[raw_codes]
+    keep &= ~(missing & (n_parts[row] == 1))
+
+    offsets = np.zeros(len(cells) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(row[keep], minlength=len(cells)), out=offsets[1:])
+    return offsets, codes[keep].astype(np.int32), np.asarray(vocab, dtype=object)
+
+
+def explode_labels(df: pd.DataFrame, col: str, out_col: str = "skill", sep: str = LABEL_SEP) -> pd.DataFrame:
+    # Long format like splitting `col` and DataFrame.explode: one row per (row, label) in
+    # label order, rows without labels dropped, index kept, labels in `out_col`.
+    offsets, codes, vocab = decode_labels(df[col], sep)
+    pos = np.repeat(np.arange(len(df)), np.diff(offsets))
+    out = df.iloc[pos].copy()
+    out[out_col] = vocab[codes]
+    return out
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+from pathlib import Path
+import argparse
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from build_dataset import KEY_COLS
+from parsed_store import ad_fingerprints
+
+
+SHINGLE_SIZE = 5
+NUM_BANDS = 16
+ROWS_PER_BAND = 8
+SIMILARITY_THRESHOLD = 0.8
+
+# MinHash permutations are h -> (a*h + b) mod P over 31-bit shingle hashes, so a*h fits in int64.
+MERSENNE_P = (1 << 31) - 1
+HASH_BASE = np.uint64(1000003)
+PERMUTATION_SEED = 20230115
+BATCH_SHINGLES = 1 << 16
+
+DIGIT_RE = re.compile(r"\d")
+SPACE_RE = re.compile(r"\s+")
+
+
+def configure_stdout():
+    try:
+        if hasattr(sys.stdout, "reconfigure"):
+            sys.stdout.reconfigure(encoding="utf-8", errors="replace")
+    except Exception:
+        pass
+
+
+def shingle_text(text: str) -> str:
+    # Dates and phone numbers change between reposts; mask digits so they do not count as edits.
+    return SPACE_RE.sub(" ", DIGIT_RE.sub("0", text or "")).strip()
+
+
+def shingle_hashes(text: str, k: int = SHINGLE_SIZE) -> np.ndarray:
+    # Unique polynomial hashes of all k-character shingles, reduced to [0, P).
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    if len(codes) == 0:
+        return np.empty(0, dtype=np.int64)
+    k = min(k, len(codes))
+    n = len(codes) - k + 1
+    h = np.zeros(n, dtype=np.uint64)
+    for j in range(k):
+        h = h * HASH_BASE + codes[j:j + n]
+    return np.unique((h % np.uint64(MERSENNE_P)).astype(np.int64))
+
+
+def make_permutations(num_perm: int, seed: int = PERMUTATION_SEED) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MERSENNE_P, size=num_perm, dtype=np.int64)
+    b = rng.integers(0, MERSENNE_P, size=num_perm, dtype=np.int64)
+    return a, b
+
+
+def minhash_signatures(hash_sets: list[np.ndarray], a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # Ads without shingles keep the all-P signature and are left out of banding.
+    sig = np.full((len(hash_sets), len(a)), MERSENNE_P, dtype=np.int64)
+    nonempty = [i for i, h in enumerate(hash_sets) if len(h)]
+
+    start = 0
+    while start < len(nonempty):
+        stop, total = start, 0
+        while stop < len(nonempty) and (total == 0 or total + len(hash_sets[nonempty[stop]]) <= BATCH_SHINGLES):
+            total += len(hash_sets[nonempty[stop]])
+            stop += 1
+        rows = nonempty[start:stop]
+        flat = np.concatenate([hash_sets[i] for i in rows])
+        offsets = np.cumsum([0] + [len(hash_sets[i]) for i in rows[:-1]])
+        for p in range(len(a)):
+            sig[rows, p] = np.minimum.reduceat((a[p] * flat + b[p]) % MERSENNE_P, offsets)
+        start = stop
+    return sig.astype(np.uint32)
+
+
+def candidate_pairs(sig: np.ndarray, valid: np.ndarray, bands: int, rows: int) -> np.ndarray:
+    # LSH banding: ads sharing any band bucket become (bucket head, member) candidate pairs.
+    idx = np.flatnonzero(valid)
+    pairs = []
+    for band in range(bands):
+        block = sig[idx, band * rows:(band + 1) * rows].astype(np.uint64)
+        key = np.zeros(len(idx), dtype=np.uint64)
+        for c in range(rows):
+            key = key * HASH_BASE + block[:, c]
+
+        order = np.argsort(key, kind="stable")
+        sorted_key = key[order]
+        new_bucket = np.ones(len(order), dtype=bool)
+        new_bucket[1:] = sorted_key[1:] != sorted_key[:-1]
+        head = order[np.maximum.accumulate(np.where(new_bucket, np.arange(len(order)), 0))]
+        member = ~new_bucket
+        pairs.append(np.stack([idx[head[member]], idx[order[member]]], axis=1))
+
+    if not pairs:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.unique(np.concatenate(pairs), axis=0)
+
+
+def union_find(n: int, pairs: np.ndarray) -> np.ndarray:
+    # Roots are the smallest row index of each component, i.e. the earliest ad.
+    parent = np.arange(n)
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for i, j in pairs:
+        ri, rj = find(int(i)), find(int(j))
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+    return np.array([find(i) for i in range(n)], dtype=np.int64)
+
+
+def load_index(path: Path, num_perm: int, shingle_size: int) -> dict[int, np.ndarray]:
+    # fingerprint -> signature; an index built with other parameters is ignored.
+    if not path.exists():
+        return {}
+    with np.load(path) as z:
+        if int(z["num_perm"]) != num_perm or int(z["shingle_size"]) != shingle_size:
+            return {}
+        return dict(zip(z["fingerprints"].tolist(), z["signatures"]))
+
+
+def save_index(path: Path, index: dict[int, np.ndarray], num_perm: int, shingle_size: int) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fps = np.fromiter(index.keys(), dtype=np.int64, count=len(index))
+    sigs = np.stack(list(index.values())) if index else np.empty((0, num_perm), dtype=np.uint32)
+    tmp = path.with_name(path.name + ".tmp.npz")
+    np.savez_compressed(tmp, fingerprints=fps, signatures=sigs, num_perm=num_perm, shingle_size=shingle_size)
+    tmp.replace(path)
+
+
+def main():
+    configure_stdout()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", type=str, default="outputs/ads_parsed_all.csv")
+    parser.add_argument("--out", type=str, default="outputs/ads_near_duplicates.csv")
+    parser.add_argument("--index", type=str, default="outputs/near_dup_signatures.npz", help="Persisted MinHash signatures keyed by ad fingerprint")
+    parser.add_argument("--threshold", type=float, default=SIMILARITY_THRESHOLD, help="Minimum estimated Jaccard similarity for a near-duplicate")
+    parser.add_argument("--bands", type=int, default=NUM_BANDS)
+    parser.add_argument("--rows", type=int, default=ROWS_PER_BAND)
+    parser.add_argument("--shingle", type=int, default=SHINGLE_SIZE, help="Shingle length in characters")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the persisted signatures and recompute all")
+    args = parser.parse_args()
+
+    root = Path(__file__).resolve().parents[1]
+    in_csv = (root / args.input).resolve()
+    out_csv = (root / args.out).resolve()
+    index_path = (root / args.index).resolve()
+
+    if not in_csv.exists():
+        raise FileNotFoundError(f"Input CSV not found: {in_csv}")
+
+    num_perm = args.bands * args.rows
+    df = pd.read_csv(in_csv, encoding="utf-8-sig")
+    fps = ad_fingerprints(df)
+
+    t0 = time.perf_counter()
+    index = {} if args.rebuild else load_index(index_path, num_perm, args.shingle)
+    new = [i for i, fp in enumerate(fps) if fp not in index]
+    a, b = make_permutations(num_perm)
+    texts = df["text_norm"].fillna("").astype(str)
+    new_sigs = minhash_signatures([shingle_hashes(shingle_text(texts.iat[i]), args.shingle) for i in new], a, b)
+    for i, s in zip(new, new_sigs):
+        index[int(fps.iat[i])] = s
+    save_index(index_path, index, num_perm, args.shingle)
+    print(f" Signatures: {len(new)} new, {len(df) - len(new)} reused ({time.perf_counter() - t0:.2f}s)")
+
+    sig = np.stack([index[int(fp)] for fp in fps]) if len(df) else np.empty((0, num_perm), dtype=np.uint32)
+    valid = (sig != MERSENNE_P).any(axis=1) if len(df) else np.zeros(0, dtype=bool)
+
+    pairs = candidate_pairs(sig, valid, args.bands, args.rows)
+    if len(pairs):
+        similarity = (sig[pairs[:, 0]] == sig[pairs[:, 1]]).mean(axis=1)
+        pairs = pairs[similarity >= args.threshold]
+    roots = union_find(len(df), pairs)
+
+    out = df[[c for c in KEY_COLS if c in df.columns]].copy()
+    out["fingerprint"] = fps.to_numpy()
+    out["cluster_id"] = fps.to_numpy()[roots]
+    out["cluster_size"] = out.groupby("cluster_id")["cluster_id"].transform("size")
+    out["is_cluster_head"] = roots == np.arange(len(df))
+
+    out_csv.parent.mkdir(parents=True, exist_ok=True)
+    out.to_csv(out_csv, index=False, encoding="utf-8-sig")
+
+    n_clusters = int(out["is_cluster_head"].sum())
+    print(" Saved:", out_csv)
+    print(f" Ads: {len(out)}  Unique vacancies (clusters): {n_clusters}  Near-duplicates: {len(out) - n_clusters}")
+    print(f" Candidate pairs kept: {len(pairs)}  Signature index: {index_path} ({len(index)} ads)")
+
+
+if __name__ == "__main__":
+    main()
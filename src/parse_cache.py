@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+from pathlib import Path
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# Bump when the parsed row schema or parse stats change so stale per-file caches are dropped.
+CACHE_VERSION = 6
+MANIFEST_NAME = "manifest.json"
+
+MESSAGE_ID_RE = re.compile(r"(-?\d+)$")
+
+
+def file_sha256(path: Path, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def file_signature(path: Path) -> dict:
+    st = path.stat()
+    return {
+        "size": int(st.st_size),
+        "mtime_ns": int(st.st_mtime_ns),
+        "sha256": file_sha256(path),
+    }
+
+
+def load_manifest(cache_dir: Path) -> dict:
+    path = cache_dir / MANIFEST_NAME
+    if path.exists():
+        try:
+            manifest = json.loads(path.read_text(encoding="utf-8"))
+            if manifest.get("version") == CACHE_VERSION:
+                return manifest
+        except (OSError, ValueError):
+            pass
+    return {"version": CACHE_VERSION, "files": {}}
+
+
+def save_manifest(cache_dir: Path, manifest: dict) -> None:
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    path = cache_dir / MANIFEST_NAME
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def load_cached(path: Path, entry: dict | None, cache_dir: Path) -> pd.DataFrame | None:
+    # Size + mtime is the fast path; a touched file is only re-parsed if its hash changed.
+    if not entry:
+        return None
+    cache_path = cache_dir / entry.get("cache", "")
+    if not cache_path.is_file():
+        return None
+
+    st = path.stat()
+    if entry.get("size") != st.st_size:
+        return None
+    if entry.get("mtime_ns") != st.st_mtime_ns:
+        if entry.get("sha256") != file_sha256(path):
+            return None
+        entry["mtime_ns"] = int(st.st_mtime_ns)
+
+    return pd.read_pickle(cache_path)
+
+
+def store_cached(path: Path, df: pd.DataFrame, manifest: dict, cache_dir: Path) -> None:
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    cache_name = f"{path.name}.pkl"
+    df.to_pickle(cache_dir / cache_name)
+    manifest["files"][path.name] = {**file_signature(path), "cache": cache_name}
+
+
+def message_id_number(msg_id: str | None) -> int | None:
+    m = MESSAGE_ID_RE.search(msg_id or "")
+    return int(m.group(1)) if m else None
+
+
+def message_id_numbers(message_ids: pd.Series) -> np.ndarray:
+    # "message12,message13" cells -> sorted unique int64 ids
+    parts = message_ids.dropna().astype(str).str.split(",").explode()
+    nums = pd.to_numeric(parts.str.extract(MESSAGE_ID_RE, expand=False), errors="coerce").dropna()
+    return np.unique(nums.to_numpy(dtype=np.int64))
+
+
+def load_id_index(path: Path) -> np.ndarray:
+    if not path.exists():
+        return np.empty(0, dtype=np.int64)
+    return np.load(path)
+
+
+def save_id_index(path: Path, ids: np.ndarray) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as fh:
+        np.save(fh, np.unique(ids.astype(np.int64)))
+    os.replace(tmp, path)
+
+
+def ids_known(index: np.ndarray, msg_ids: list[str | None]) -> bool:
+    # True only when every message of the group is already in the sorted id index.
+    nums = [message_id_number(x) for x in msg_ids]
+    if not nums or any(n is None for n in nums) or len(index) == 0:
+        return False
+    arr = np.asarray(nums, dtype=np.int64)
+    pos = np.searchsorted(index, arr).clip(max=len(index) - 1)
+    return bool((index[pos] == arr).all())
@@ -4,17 +4,54 @@ from pathlib import Path
 import re
 import html as htmllib
 import argparse
+import io
+import math
+import mmap
+import numpy as np
 import pandas as pd
+import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
 from bs4 import BeautifulSoup
+from lxml import etree
+
+from parse_cache import (
+    ids_known,
+    load_cached,
+    load_id_index,
+    load_manifest,
+    message_id_numbers,
+    save_id_index,
+    save_manifest,
+    store_cached,
+)
+from field_extractor import extract_fields
+from multilabel_codec import LABEL_SEP
+from ad_triage import TRIAGE_MIN_SCORE, triage_score
+from parsed_store import (
+    channel_dir,
+    content_fingerprint,
+    month_keys,
+    parse_date_titles,
+    partition_dir,
+    write_channel_partitions,
+    write_month_partitions,
+)
+from telegram_json import iter_json_groups
+
+from text_normalize import fold_text, normalize_call_count, normalize_series, normalize_text, report_normalize_calls
 
 
 TITLE_RE = re.compile(r"[«\"]\s*([^»\"]+?)\s*[»\"]")
+MESSAGE_DIV_RE = re.compile(rb'<div class="message(?: ([^"]*))?"')
 
-PERSIAN_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹", "0123456789")
-ARABIC_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩", "0123456789")
-ARABIC_LETTERS = str.maketrans({"ي": "ی", "ك": "ک", "ة": "ه", "ۀ": "ه", "ؤ": "و", "إ": "ا", "أ": "ا"})
-
+PARSED_COLUMNS = [
+    "source_file", "group_index", "message_ids", "date_title", "job_title",
+    "company", "location", "education", "experience", "text_raw", "text_norm", "triage_score",
+    "fingerprint", "repost_count", "first_seen", "last_seen",
+]
 
 def configure_stdout():
     try:
@@ -24,111 +61,323 @@ def configure_stdout():
         pass
 
 
-def normalize_text(s: str) -> str:
-    s = htmllib.unescape(s or "")
-    s = s.translate(ARABIC_LETTERS).translate(PERSIAN_DIGITS).translate(ARABIC_DIGITS)
-    s = s.replace("\u200c", " ")
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
-
-
 def clean_html_text(el) -> str:
+    # With strip=True, text on either side of a <br> already ends up in separate
+    # newline-joined strings, so the tree is read as-is instead of rewriting <br>s.
     if el is None:
         return ""
-    for br in el.find_all("br"):
-        br.replace_with("\n")
     txt = el.get_text("\n", strip=True)
     txt = htmllib.unescape(txt)
     txt = re.sub(r"\n{3,}", "\n\n", txt)
     return txt.strip()
 
 
-def group_joined_messages(soup: BeautifulSoup) -> list[dict]:
-    msgs = [m for m in soup.select("div.message") if "default" in (m.get("class") or [])]
+MESSAGE_PARTS = {
+    "text": ("text",),
+    "date": ("pull_right", "date", "details"),
+    "from_name": ("from_name",),
+}
+
+
+def read_message_parts(m) -> dict:
+    # One document-order walk over the message's descendants, stopping once the
+    # first div.text, div.pull_right.date.details and div.from_name are all found.
+    found: dict = {}
+    for node in m.descendants:
+        if getattr(node, "name", None) != "div":
+            continue
+        classes = node.get("class") or []
+        for part, needed in MESSAGE_PARTS.items():
+            if part not in found and all(c in classes for c in needed):
+                found[part] = node
+        if len(found) == len(MESSAGE_PARTS):
+            break
+    return found
+
+
+def group_joined_messages(soup: BeautifulSoup, skip_ids: np.ndarray | None = None, stats: dict | None = None) -> list[dict]:
+    msgs = [m for m in soup.find_all("div", class_="message") if "default" in (m.get("class") or [])]
     groups: list[dict] = []
+    n_groups = 0
 
     i = 0
     while i < len(msgs):
-        m = msgs[i]
-        texts = [clean_html_text(m.select_one("div.text"))]
-        ids = [m.get("id")]
+        j = i + 1
+        while j < len(msgs) and "joined" in (msgs[j].get("class") or []):
+            j += 1
+
+        ids = [x.get("id") for x in msgs[i:j]]
+        if skip_ids is not None and ids_known(skip_ids, ids):
+            n_groups += 1
+            i = j
+            continue
 
-        dt = m.select_one("div.pull_right.date.details")
+        parts = [read_message_parts(x) for x in msgs[i:j]]
+        texts = [clean_html_text(p.get("text")) for p in parts]
+
+        dt = parts[0].get("date")
         dt_title = dt.get("title") if dt else None
 
-        frm_el = m.select_one("div.from_name")
+        frm_el = parts[0].get("from_name")
         from_name = clean_html_text(frm_el) if frm_el else None
 
-        j = i + 1
-        while j < len(msgs) and "joined" in (msgs[j].get("class") or []):
-            texts.append(clean_html_text(msgs[j].select_one("div.text")))
-            ids.append(msgs[j].get("id"))
-            j += 1
-
         groups.append(
             {
-                "group_index": len(groups),
+                "group_index": n_groups,
                 "message_ids": ",".join([x for x in ids if x]),
                 "dt_title": dt_title,
                 "from_name": from_name,
                 "text": "\n\n".join([t for t in texts if t]).strip(),
             }
         )
+        n_groups += 1
         i = j
 
+    if stats is not None:
+        stats["default_messages"] = stats.get("default_messages", 0) + len(msgs)
+        stats["joined_messages"] = stats.get("joined_messages", 0) + sum("joined" in (m.get("class") or []) for m in msgs)
+        stats["groups"] = stats.get("groups", 0) + n_groups
+        stats["skipped"] = stats.get("skipped", 0) + n_groups - len(groups)
     return groups
 
 
-def extract_field_anykey(text: str, keys: list[str]) -> str | None:
-    for k in keys:
-        m = re.search(rf"{re.escape(k)}\s*[:：]?\s*(.+)", text)
-        if m:
-            val = m.group(1).strip().split("\n")[0].strip()
-            return val
-    return None
+def find_parts(el) -> dict:
+    # lxml counterpart of read_message_parts: a single el.iter("div") pass.
+    found: dict = {}
+    for d in el.iter("div"):
+        if d is el:
+            continue
+        classes = (d.get("class") or "").split()
+        for part, needed in MESSAGE_PARTS.items():
+            if part not in found and all(c in classes for c in needed):
+                found[part] = d
+        if len(found) == len(MESSAGE_PARTS):
+            break
+    return found
 
 
-def parse_ads_from_html(html_path: Path) -> pd.DataFrame:
-    html_text = html_path.read_text(encoding="utf-8", errors="ignore")
-    soup = BeautifulSoup(html_text, "html.parser")
-
-    groups = group_joined_messages(soup)
+def element_text(el) -> str:
+    # lxml counterpart of clean_html_text: stripped text nodes joined by newlines.
+    if el is None:
+        return ""
+    txt = "\n".join(t for t in (part.strip() for part in el.itertext()) if t)
+    txt = htmllib.unescape(txt)
+    txt = re.sub(r"\n{3,}", "\n\n", txt)
+    return txt.strip()
 
-    company_keys = ["نام شرکت", "شرکت", "نام‌شرکت", "فعالیت"]
-    location_keys = ["شهرستان و محدوده مکانی", "شهرستان", "شهر", "محل فعالیت"]
-    education_keys = ["مدرک تحصیلی", "تحصیلات"]
-    experience_keys = ["سابقه فعالیت", "سابقه کار", "سابقه کاری", "سابقه"]
 
+def build_group(msgs: list, group_index: int) -> dict:
+    parts = [find_parts(m) for m in msgs]
+
+    dt = parts[0].get("date")
+    frm_el = parts[0].get("from_name")
+
+    texts = [element_text(p.get("text")) for p in parts]
+    ids = [m.get("id") for m in msgs]
+
+    return {
+        "group_index": group_index,
+        "message_ids": ",".join([x for x in ids if x]),
+        "dt_title": dt.get("title") if dt is not None else None,
+        "from_name": element_text(frm_el) if frm_el is not None else None,
+        "text": "\n\n".join([t for t in texts if t]).strip(),
+    }
+
+
+def release_elements(msgs: list) -> None:
+    # Drop finished messages (and everything parsed before them) from the partial tree.
+    for m in msgs:
+        m.clear()
+    last = msgs[-1]
+    parent = last.getparent()
+    if parent is None:
+        return
+    while last.getprevious() is not None:
+        del parent[0]
+
+
+def iter_message_groups(source, skip_ids: np.ndarray | None = None, stats: dict | None = None) -> Iterator[dict]:
+    # Streaming equivalent of group_joined_messages: groups are emitted as soon as the
+    # next non-joined message closes them, so only the current group stays in memory.
+    # Groups whose message ids are all in `skip_ids` are dropped before any text work.
+    stats = stats if stats is not None else {}
+    for key in ("default_messages", "joined_messages", "groups", "skipped"):
+        stats.setdefault(key, 0)
+    pending: list = []
+
+    def close_group():
+        if skip_ids is not None and ids_known(skip_ids, [m.get("id") for m in pending]):
+            stats["skipped"] += 1
+            group = None
+        else:
+            group = build_group(pending, stats["groups"])
+        stats["groups"] += 1
+        release_elements(pending)
+        return group
+
+    for _, el in etree.iterparse(source, events=("end",), tag="div", html=True, encoding="utf-8"):
+        classes = (el.get("class") or "").split()
+        if "message" not in classes or "default" not in classes:
+            continue
+        stats["default_messages"] += 1
+        stats["joined_messages"] += "joined" in classes
+
+        if pending and "joined" in classes:
+            pending.append(el)
+            continue
+
+        if pending:
+            group = close_group()
+            if group is not None:
+                yield group
+        pending = [el]
+
+    if pending:
+        group = close_group()
+        if group is not None:
+            yield group
+
+
+def next_chunk_start(mm, pos: int) -> int | None:
+    # A chunk may only start on a message that opens a new group (default, not joined).
+    while True:
+        m = MESSAGE_DIV_RE.search(mm, pos)
+        if m is None:
+            return None
+        classes = (m.group(1) or b"").split()
+        if b"default" in classes and b"joined" not in classes:
+            return m.start()
+        pos = m.end()
+
+
+def plan_chunks(html_path: Path, n_chunks: int) -> list[tuple[int, int]]:
+    size = html_path.stat().st_size
+    if n_chunks <= 1 or size == 0:
+        return [(0, size)]
+
+    cuts = [0]
+    with open(html_path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for k in range(1, n_chunks):
+            start = next_chunk_start(mm, max(size * k // n_chunks, cuts[-1] + 1))
+            if start is None:
+                break
+            cuts.append(start)
+    cuts.append(size)
+    return list(zip(cuts[:-1], cuts[1:]))
+
+
+def read_byte_range(path: Path, byte_range: tuple[int, int]) -> bytes:
+    start, end = byte_range
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        return fh.read(end - start)
+
+
+def parse_ads_from_html(
+    html_path: Path,
+    parser: str = "stream",
+    byte_range: tuple[int, int] | None = None,
+    skip_ids: np.ndarray | None = None,
+    min_score: int = TRIAGE_MIN_SCORE,
+) -> pd.DataFrame:
+    stats: dict = {}
+    if parser == "soup":
+        html_text = html_path.read_text(encoding="utf-8", errors="ignore")
+        soup = BeautifulSoup(html_text, "html.parser")
+        groups = group_joined_messages(soup, skip_ids=skip_ids, stats=stats)
+    elif byte_range is not None:
+        groups = iter_message_groups(io.BytesIO(read_byte_range(html_path, byte_range)), skip_ids=skip_ids, stats=stats)
+    else:
+        groups = iter_message_groups(str(html_path), skip_ids=skip_ids, stats=stats)
+
+    return build_ads_frame(groups, html_path.name, stats, min_score)
+
+
+def parse_ads_from_json(json_path: Path, skip_ids: np.ndarray | None = None, min_score: int = TRIAGE_MIN_SCORE) -> pd.DataFrame:
+    stats: dict = {}
+    groups = iter_json_groups(json_path, skip_ids=skip_ids, stats=stats)
+    return build_ads_frame(groups, json_path.name, stats, min_score)
+
+
+def build_ads_frame(groups, source_file: str, stats: dict, min_score: int = TRIAGE_MIN_SCORE) -> pd.DataFrame:
+    stats.setdefault("duplicates", 0)
     rows = []
+    seen: dict[int, dict] = {}
+    merged_ids: list[str] = []
+    seen_at: list[tuple[int, str | None]] = []
     for g in groups:
         raw = g["text"]
-        raw_norm = normalize_text(raw)
 
         title_m = TITLE_RE.search(raw)
         job_title = title_m.group(1).strip() if title_m else None
+        fields = extract_fields(raw)
+
+        # Groups below the triage threshold go to the non-job output and are not normalized.
+        score = triage_score(raw, title_m is not None, fields)
+        raw_norm = normalize_text(raw) if score >= min_score else None
+
+        # A repost of content already seen in this file only bumps the first row's counters.
+        # Job and non-job rows are fingerprinted on the same folded text.
+        fp = content_fingerprint(fold_text(raw), job_title, fields["company"])
+        seen_at.append((fp, g["dt_title"]))
+        first = seen.get(fp)
+        if first is not None:
+            first["repost_count"] += 1
+            stats["duplicates"] += 1
+            merged_ids.append(g["message_ids"])
+            continue
+
+        row = {
+            "source_file": source_file,
+            "group_index": g["group_index"],
+            "message_ids": g["message_ids"],
+            "date_title": g["dt_title"],
+            "job_title": job_title,
+            "company": fields["company"],
+            "location": fields["location"],
+            "education": fields["education"],
+            "experience": fields["experience"],
+            "text_raw": raw,
+            "text_norm": raw_norm,
+            "triage_score": score,
+            "fingerprint": fp,
+            "repost_count": 1,
+            "first_seen": None,
+            "last_seen": None,
+        }
+        seen[fp] = row
+        rows.append(row)
+
+    df = pd.DataFrame(rows, columns=PARSED_COLUMNS)
+    df["fingerprint"] = df["fingerprint"].astype("int64")
+    df["repost_count"] = df["repost_count"].astype("int64")
+
+    # Earliest/latest parsed date per fingerprint, like merge_reposts, so a parse split into
+    # chunks gives the same values as a serial one.
+    dates = parse_date_titles(pd.Series([d for _, d in seen_at], dtype=object))
+    by_fp = pd.Series(dates.to_numpy(), index=[fp for fp, _ in seen_at], dtype="datetime64[ns, UTC]").groupby(level=0)
+    df["first_seen"] = by_fp.min().reindex(df["fingerprint"]).to_numpy()
+    df["last_seen"] = by_fp.max().reindex(df["fingerprint"]).to_numpy()
+
+    df["job_title_norm"] = normalize_series(df["job_title"])
+    df["job_title_norm"] = df["job_title_norm"].str.replace(r"[-_–—]+", " ", regex=True).str.strip()
 
-        rows.append(
-            {
-                "source_file": html_path.name,
-                "group_index": g["group_index"],
-                "message_ids": g["message_ids"],
-                "date_title": g["dt_title"],
-                "job_title": job_title,
-                "company": extract_field_anykey(raw, company_keys),
-                "location": extract_field_anykey(raw, location_keys),
-                "education": extract_field_anykey(raw, education_keys),
-                "experience": extract_field_anykey(raw, experience_keys),
-                "text_raw": raw,
-                "text_norm": raw_norm,
-            }
-        )
+    df.attrs["parse_stats"] = stats
+    # Message ids of the folded reposts, so the --append id index covers them too.
+    df.attrs["merged_message_ids"] = merged_ids
+    return df
 
-    df = pd.DataFrame(rows)
 
-    df["job_title_norm"] = df["job_title"].fillna("").map(normalize_text)
-    df["job_title_norm"] = df["job_title_norm"].str.replace(r"[-_–—]+", " ", regex=True).str.strip()
+def find_json_exports(raw_dir: Path) -> list[Path]:
+    return sorted((p.resolve() for p in raw_dir.glob("result*.json") if p.is_file()), key=lambda x: x.name)
 
-    return df
+
+def find_export_files(raw_dir: Path, fmt: str = "auto") -> list[Path]:
+    # auto prefers the machine-readable result.json when the export has one.
+    json_files = find_json_exports(raw_dir) if fmt in {"auto", "json"} else []
+    if fmt == "json" or (fmt == "auto" and json_files):
+        return json_files
+    return find_message_files(raw_dir)
 
 
 def find_message_files(raw_dir: Path) -> list[Path]:
@@ -152,42 +401,400 @@ def find_message_files(raw_dir: Path) -> list[Path]:
     return unique
 
 
+def timed_parse(
+    html_path: Path,
+    parser: str = "stream",
+    byte_range: tuple[int, int] | None = None,
+    skip_ids: np.ndarray | None = None,
+    min_score: int = TRIAGE_MIN_SCORE,
+) -> tuple[pd.DataFrame, float]:
+    t0 = time.perf_counter()
+    n_norm = normalize_call_count()
+    if html_path.suffix.lower() == ".json":
+        df = parse_ads_from_json(html_path, skip_ids=skip_ids, min_score=min_score)
+    else:
+        df = parse_ads_from_html(html_path, parser=parser, byte_range=byte_range, skip_ids=skip_ids, min_score=min_score)
+    secs = time.perf_counter() - t0
+    df.attrs["parse_stats"]["seconds"] = secs
+    df.attrs["parse_stats"]["normalize_calls"] = normalize_call_count() - n_norm
+    return df, secs
+
+
+def stitch_chunks(dfs: list[pd.DataFrame]) -> pd.DataFrame:
+    # Chunks number their groups from 0; shift them so group_index matches a serial parse.
+    if len(dfs) == 1:
+        return dfs[0]
+    offset = 0
+    shifted = []
+    for df in dfs:
+        shifted.append(df.assign(group_index=df["group_index"] + offset))
+        offset += df.attrs["parse_stats"]["groups"]
+    out = pd.concat(shifted, ignore_index=True)
+    out.attrs["parse_stats"] = {
+        k: sum(df.attrs["parse_stats"].get(k, 0) for df in dfs) for k in dfs[0].attrs["parse_stats"]
+    }
+    out.attrs["merged_message_ids"] = [m for df in dfs for m in df.attrs.get("merged_message_ids", [])]
+    return out
+
+
+def parse_files(
+    files: list[Path],
+    parser: str = "stream",
+    workers: int = 1,
+    chunk_bytes: int = 0,
+    skip_ids: dict[Path, np.ndarray] | None = None,
+    min_score: int = TRIAGE_MIN_SCORE,
+) -> list[pd.DataFrame]:
+    # Large files are split into message-aligned byte ranges so they can use several cores;
+    # results are always collected in `files` order. `skip_ids` maps a file to the message
+    # ids already ingested from its channel.
+    tasks: list[tuple[Path, tuple[int, int] | None]] = []
+    for f in files:
+        n_chunks = 1
+        if workers > 1 and chunk_bytes > 0 and parser == "stream" and f.suffix.lower() != ".json":
+            n_chunks = math.ceil(f.stat().st_size / chunk_bytes)
+        if n_chunks > 1:
+            tasks += [(f, r) for r in plan_chunks(f, n_chunks)]
+        else:
+            tasks.append((f, None))
+
+    paths = [t[0] for t in tasks]
+    ranges = [t[1] for t in tasks]
+    skips = [(skip_ids or {}).get(p) for p in paths]
+    n = len(tasks)
+
+    if workers <= 1 or n <= 1:
+        results = list(map(timed_parse, paths, [parser] * n, ranges, skips, [min_score] * n))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, n)) as pool:
+            results = list(pool.map(timed_parse, paths, [parser] * n, ranges, skips, [min_score] * n))
+
+    all_dfs = []
+    for f in files:
+        parts = [res for path, res in zip(paths, results) if path == f]
+        df = stitch_chunks([d for d, _ in parts])
+        secs = sum(t for _, t in parts)
+        chunks = f", {len(parts)} chunks" if len(parts) > 1 else ""
+        skipped = df.attrs["parse_stats"].get("skipped", 0)
+        known = f", {skipped} already ingested" if skipped else ""
+        all_dfs.append(df)
+        print(f" {f.parent.name}/{f.name}: {len(df)} groups ({secs:.2f}s{chunks}{known})")
+    return all_dfs
+
+
+def parse_with_cache(files: list[Path], cache_dirs: list[Path], **parse_kwargs) -> list[pd.DataFrame]:
+    # Unchanged files come from the per-file cache; only new or modified ones are parsed.
+    # cache_dirs[i] (one per channel) holds the manifest for files[i]; stale files of all
+    # channels are parsed in one parse_files call so they share the worker pool.
+    min_score = parse_kwargs.get("min_score", TRIAGE_MIN_SCORE)
+    manifests: dict[Path, dict] = {}
+    for cache_dir in dict.fromkeys(cache_dirs):
+        manifest = load_manifest(cache_dir)
+        # text_norm is only filled above the triage threshold, so a new threshold invalidates the cache.
+        if manifest.get("triage_min_score") != min_score:
+            manifest["files"] = {}
+        manifest["triage_min_score"] = min_score
+        manifests[cache_dir] = manifest
+
+    cached: dict[Path, pd.DataFrame] = {}
+    stale: list[Path] = []
+    for f, cache_dir in zip(files, cache_dirs):
+        df = load_cached(f, manifests[cache_dir]["files"].get(f.name), cache_dir)
+        if df is None:
+            stale.append(f)
+        else:
+            df.attrs["parse_stats"] = {**df.attrs.get("parse_stats", {}), "cached": True}
+            cached[f] = df
+            print(f" {f.parent.name}/{f.name}: {len(df)} groups (cached)")
+
+    dir_of = dict(zip(files, cache_dirs))
+    parsed = dict(zip(stale, parse_files(stale, **parse_kwargs)))
+    for f, df in parsed.items():
+        store_cached(f, df, manifests[dir_of[f]], dir_of[f])
+    for cache_dir, manifest in manifests.items():
+        save_manifest(cache_dir, manifest)
+
+    print(f" Cache: {len(cached)} files reused, {len(stale)} parsed")
+    return [cached[f] if f in cached else parsed[f] for f in files]
+
+
+def merge_reposts(df: pd.DataFrame) -> pd.DataFrame:
+    # Cross-file pass on the int64 fingerprint (files/chunks were already merged internally):
+    # keep the first row per fingerprint and fold the others into its counters.
+    first = parse_date_titles(df["first_seen"])
+    last = parse_date_titles(df["last_seen"])
+    fp = df["fingerprint"]
+
+    # The kept row stays in its own channel; repost_channel_names lists every channel it
+    # appeared in ("|"-joined, sorted) and repost_channels counts them.
+    channels = df[["fingerprint", "channel"]].drop_duplicates().sort_values("channel")
+    names = channels.groupby("fingerprint")["channel"].agg(LABEL_SEP.join)
+    df = df.assign(
+        repost_count=df.groupby("fingerprint")["repost_count"].transform("sum"),
+        repost_channels=df.groupby("fingerprint")["channel"].transform("nunique"),
+        repost_channel_names=fp.map(names),
+        first_seen=first.groupby(fp).transform("min"),
+        last_seen=last.groupby(fp).transform("max"),
+    )
+    return df[~fp.duplicated(keep="first")]
+
+
+def fold_stored_reposts(csv_path: Path, reposted: pd.DataFrame) -> pd.DataFrame:
+    # --append: reposts of rows an earlier run wrote are folded into the stored row (counts
+    # add up, first/last seen widen) and the file is rewritten. Cells are read as text, so
+    # all other columns are written back unchanged. Returns the updated stored rows.
+    if reposted.empty or not csv_path.exists():
+        return pd.DataFrame()
+    stored = pd.read_csv(csv_path, encoding="utf-8-sig", dtype=str, keep_default_na=False)
+    if "fingerprint" not in stored.columns:
+        return pd.DataFrame()
+    fp = pd.to_numeric(stored["fingerprint"], errors="coerce")
+    new = reposted.drop_duplicates("fingerprint")
+    new.index = pd.Index(new["fingerprint"].to_numpy(dtype=np.int64))
+    hit = fp.isin(new.index).to_numpy()
+    if not hit.any():
+        return pd.DataFrame()
+
+    rows = stored.loc[hit]
+    add = new.reindex(fp[hit].astype("int64").to_numpy())
+    add.index = rows.index
+
+    count = pd.to_numeric(rows["repost_count"], errors="coerce").fillna(1).astype("int64") + add["repost_count"]
+    first = pd.concat([pd.to_datetime(rows["first_seen"], utc=True, errors="coerce"), add["first_seen"]], axis=1).min(axis=1)
+    last = pd.concat([pd.to_datetime(rows["last_seen"], utc=True, errors="coerce"), add["last_seen"]], axis=1).max(axis=1)
+    stored.loc[hit, "repost_count"] = count.astype(str)
+    stored.loc[hit, "first_seen"] = first.map(lambda t: "" if pd.isna(t) else str(t))
+    stored.loc[hit, "last_seen"] = last.map(lambda t: "" if pd.isna(t) else str(t))
+    if "repost_channel_names" in stored.columns:
+        # The channels of the stored row and of the new reposts, counted once each.
+        union = [
+            sorted(set(old.split(LABEL_SEP)) | set(new.split(LABEL_SEP)))
+            for old, new in zip(rows["repost_channel_names"], add["repost_channel_names"])
+        ]
+        stored.loc[hit, "repost_channel_names"] = [LABEL_SEP.join(u) for u in union]
+        stored.loc[hit, "repost_channels"] = [str(len(u)) for u in union]
+    elif "repost_channels" in stored.columns:
+        # Outputs written before the names were stored: the larger count is a lower bound.
+        old = pd.to_numeric(rows["repost_channels"], errors="coerce").fillna(1).astype("int64")
+        stored.loc[hit, "repost_channels"] = np.maximum(old, add["repost_channels"]).astype(str)
+
+    stored.to_csv(csv_path, index=False, encoding="utf-8-sig")
+    return stored.loc[hit]
+
+
+def read_fingerprints(csv_path: Path) -> np.ndarray:
+    if not csv_path.exists():
+        return np.empty(0, dtype=np.int64)
+    if "fingerprint" not in pd.read_csv(csv_path, encoding="utf-8-sig", nrows=0).columns:
+        return np.empty(0, dtype=np.int64)
+    fps = pd.read_csv(csv_path, encoding="utf-8-sig", usecols=["fingerprint"])["fingerprint"]
+    return fps.dropna().to_numpy(dtype=np.int64)
+
+
+def coverage_report(
+    files: list[Path],
+    channels: list[str],
+    all_dfs: list[pd.DataFrame],
+    out: pd.DataFrame,
+    non_job: pd.DataFrame,
+) -> pd.DataFrame:
+    # Per-file counters collected while parsing; replaces re-parsing the exports to audit them.
+    kept = out.groupby(["channel", "source_file"]).size()
+    triaged = non_job.groupby(["channel", "source_file"]).size()
+    rows = []
+    for f, channel, df in zip(files, channels, all_dfs):
+        stats = df.attrs.get("parse_stats", {})
+        n_kept = int(kept.get((channel, f.name), 0))
+        n_non_job = int(triaged.get((channel, f.name), 0))
+        n_dups = int(stats.get("duplicates", 0)) + len(df) - n_kept - n_non_job
+        rows.append(
+            {
+                "channel": channel,
+                "file": f.name,
+                "html_default_messages": int(stats.get("default_messages", 0)),
+                "html_joined_messages": int(stats.get("joined_messages", 0)),
+                "groups_from_html": int(stats.get("groups", 0)),
+                "skipped_known": int(stats.get("skipped", 0)),
+                "parsed_groups": n_kept,
+                "non_job_groups": n_non_job,
+                "dropped_duplicates": n_dups,
+                "parse_seconds": round(float(stats.get("seconds", 0.0)), 3),
+                "cached": bool(stats.get("cached", False)),
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def parse_channel_arg(value: str, root: Path) -> tuple[str, Path]:
+    # "name=path" or a bare path; a bare path is named after its directory.
+    name, sep, path = value.partition("=")
+    if not sep:
+        name, path = "", value
+    raw_dir = (root / path).resolve()
+    return name or raw_dir.name, raw_dir
+
+
+def channel_ids_path(out_csv: Path, channel: str) -> Path:
+    # Message ids are only unique within a channel, so each channel has its own index.
+    return out_csv.with_name(out_csv.stem + ".ids") / f"{channel}.npy"
+
+
+def load_known_ids(out_csv: Path, channel: str) -> np.ndarray:
+    ids_path = channel_ids_path(out_csv, channel)
+    if ids_path.exists():
+        return load_id_index(ids_path)
+    header = pd.read_csv(out_csv, encoding="utf-8-sig", nrows=0).columns
+    cols = ["message_ids"] + (["channel"] if "channel" in header else [])
+    prev = pd.read_csv(out_csv, encoding="utf-8-sig", usecols=cols)
+    if "channel" in prev.columns:
+        prev = prev[prev["channel"] == channel]
+    return message_id_numbers(prev["message_ids"])
+
+
 def main():
     configure_stdout()
     parser = argparse.ArgumentParser()
-    parser.add_argument("--input-dir", type=str, default="data/raw", help="Directory containing Telegram export HTML files")
+    parser.add_argument("--input-dir", type=str, nargs="+", default=["data/raw"], help="Telegram export directories, one per channel (NAME=DIR or DIR; NAME defaults to the directory name)")
+    parser.add_argument("--format", type=str, default="auto", choices=["auto", "html", "json"], help="Export format to read (auto = result.json if present, else messages*.html)")
     parser.add_argument("--output", type=str, default="outputs/ads_parsed_all.csv", help="Output CSV path")
+    parser.add_argument("--parser", type=str, default="stream", choices=["stream", "soup"], help="stream = lxml iterparse (constant memory), soup = full BeautifulSoup tree")
+    parser.add_argument("--workers", type=int, default=1, help="Parse export files in N processes (0 = all CPU cores)")
+    parser.add_argument("--chunk-mb", type=float, default=8.0, help="With --workers, split files larger than this into message-aligned chunks (0 = whole files only)")
+    parser.add_argument("--cache-dir", type=str, default="outputs/.parse_cache", help="Per-file parse cache + manifest for incremental runs (one subdirectory per channel)")
+    parser.add_argument("--no-cache", action="store_true", help="Re-parse every file and leave the cache untouched")
+    parser.add_argument("--append", action="store_true", help="Skip groups whose message ids are already in the output and append only new rows")
+    parser.add_argument("--triage-min-score", type=int, default=TRIAGE_MIN_SCORE, help="Groups scoring below this (fields + quoted title + hiring keywords) go to <output>.non_job.csv (0 = keep all)")
     args = parser.parse_args()
 
     root = Path(__file__).resolve().parents[1]
-    raw_dir = (root / args.input_dir).resolve()
     out_csv = (root / args.output).resolve()
 
-    if not raw_dir.exists():
-        raise FileNotFoundError(f"Input dir not found: {raw_dir}")
-
-    files = find_message_files(raw_dir)
-    if not files:
-        raise FileNotFoundError(f"No telegram message html files found in: {raw_dir}")
-
-    all_dfs = []
-    for f in files:
-        df = parse_ads_from_html(f)
-        all_dfs.append(df)
-        print(f" {f.name}: {len(df)} groups")
-
+    sources = [parse_channel_arg(v, root) for v in args.input_dir]
+    names = [name for name, _ in sources]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Channel names must be unique (use NAME=DIR): {names}")
+
+    files: list[Path] = []
+    file_channels: list[str] = []
+    for name, raw_dir in sources:
+        if not raw_dir.exists():
+            raise FileNotFoundError(f"Input dir not found: {raw_dir}")
+        found = find_export_files(raw_dir, args.format)
+        if not found:
+            raise FileNotFoundError(f"No telegram export files ({args.format}) found in: {raw_dir}")
+        files += found
+        file_channels += [name] * len(found)
+        print(f" Channel {name}: {len(found)} files in {raw_dir}")
+
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+
+    coverage_path = out_csv.with_name(out_csv.stem + ".coverage.csv")
+    non_job_csv = out_csv.with_name(out_csv.stem + ".non_job.csv")
+    append = args.append and out_csv.exists()
+
+    # Per-channel message-id index of everything already written to out_csv (sorted int64 arrays).
+    known_ids: dict[str, np.ndarray] = {}
+    if append:
+        known_ids = {name: load_known_ids(out_csv, name) for name in names}
+        print(" Known message ids: " + ", ".join(f"{k}: {len(v)}" for k, v in known_ids.items()))
+
+    # All channels go through one parse_files call, so their files are parsed concurrently.
+    t0 = time.perf_counter()
+    n_norm = normalize_call_count()
+    parse_kwargs = {
+        "parser": args.parser,
+        "workers": workers,
+        "chunk_bytes": int(args.chunk_mb * 1024 * 1024),
+        "min_score": args.triage_min_score,
+    }
+    if append:
+        # The per-file cache only holds complete parses, so append runs bypass it.
+        skip_ids = {f: known_ids[ch] for f, ch in zip(files, file_channels)}
+        all_dfs = parse_files(files, skip_ids=skip_ids, **parse_kwargs)
+    elif args.no_cache:
+        all_dfs = parse_files(files, **parse_kwargs)
+    else:
+        cache_root = (root / args.cache_dir).resolve()
+        all_dfs = parse_with_cache(files, [cache_root / ch for ch in file_channels], **parse_kwargs)
+    # Parse stats hold each file's normalize calls; the ones made in pool workers are not in our counter.
+    parsed_calls = sum(df.attrs["parse_stats"].get("normalize_calls", 0) for df in all_dfs if not df.attrs["parse_stats"].get("cached"))
+    worker_calls = parsed_calls - (normalize_call_count() - n_norm)
+    print(f" Parsed {len(files)} files from {len(names)} channels in {time.perf_counter() - t0:.2f}s (workers={workers})")
+
+    all_dfs = [df.assign(channel=ch) for df, ch in zip(all_dfs, file_channels)]
     out = pd.concat(all_dfs, ignore_index=True)
 
-    
-    out = out.drop_duplicates(subset=["message_ids", "date_title", "job_title", "company"], keep="first")
+    # Every parsed group counts as ingested, reposts folded into another row included, so
+    # --append does not parse them again.
+    folded = pd.DataFrame(
+        [(ch, ids) for df, ch in zip(all_dfs, file_channels) for ids in df.attrs.get("merged_message_ids", [])],
+        columns=["channel", "message_ids"],
+    )
+    ingested = pd.concat([out[["channel", "message_ids"]], folded], ignore_index=True)
+
+    # One fingerprint index across channels: a vacancy posted in several channels is kept once.
+    out = merge_reposts(out)
+
+    # Append runs fold reposts of content already written into the stored rows (and their
+    # month/channel partitions) instead of appending them.
+    n_stored_reposts = 0
+    if append:
+        known_fps = np.concatenate([read_fingerprints(out_csv), read_fingerprints(non_job_csv)])
+        is_known = out["fingerprint"].isin(known_fps)
+        reposted, out = out[is_known], out[~is_known]
+        n_stored_reposts = len(reposted)
+        updated = fold_stored_reposts(out_csv, reposted)
+        fold_stored_reposts(non_job_csv, reposted)
+        if len(updated):
+            months = month_keys(pd.to_datetime(updated["posted_at"], utc=True, errors="coerce"))
+            for path in [partition_dir(out_csv) / f"{m}.csv" for m in months.unique()]:
+                fold_stored_reposts(path, reposted)
+            for path in [channel_dir(out_csv) / f"{c}.csv" for c in updated["channel"].unique()]:
+                fold_stored_reposts(path, reposted)
+
+    out["posted_at"] = parse_date_titles(out["date_title"])
+
+    is_job = out["triage_score"] >= args.triage_min_score
+    non_job = out[~is_job]
+    out = out[is_job]
+
+    coverage = coverage_report(files, file_channels, all_dfs, out, non_job)
 
     out_csv.parent.mkdir(parents=True, exist_ok=True)
-    out.to_csv(out_csv, index=False, encoding="utf-8-sig")
+    coverage.to_csv(coverage_path, index=False, encoding="utf-8-sig")
+    part_dir = write_month_partitions(out, out_csv, append=append)
+    chan_dir = write_channel_partitions(out, out_csv, append=append)
+    if append:
+        header = pd.read_csv(out_csv, encoding="utf-8-sig", nrows=0).columns
+        out.reindex(columns=header).to_csv(out_csv, mode="a", header=False, index=False, encoding="utf-8")
+    else:
+        out.to_csv(out_csv, index=False, encoding="utf-8-sig")
+
+    if append and non_job_csv.exists():
+        header = pd.read_csv(non_job_csv, encoding="utf-8-sig", nrows=0).columns
+        non_job.reindex(columns=header).to_csv(non_job_csv, mode="a", header=False, index=False, encoding="utf-8")
+    else:
+        non_job.to_csv(non_job_csv, index=False, encoding="utf-8-sig")
+
+    # Non-job groups are ingested too, so --append does not re-triage them.
+    for name in names:
+        new_ids = message_id_numbers(ingested.loc[ingested["channel"] == name, "message_ids"])
+        save_id_index(channel_ids_path(out_csv, name), np.concatenate([known_ids[name], new_ids]) if append else new_ids)
 
     print("\n====================")
-    print(f" Total rows: {len(out)}")
+    print(f" {'Appended' if append else 'Total'} rows: {len(out)}")
     print(f" Saved: {out_csv}")
-    print(out[["source_file", "date_title", "job_title", "company", "location"]].head(10).to_string(index=False))
+    print(f" Channel partitions: {chan_dir} (" + ", ".join(f"{k}: {v}" for k, v in out["channel"].value_counts().sort_index().items()) + ")")
+    print(f" Month partitions: {part_dir} ({out['posted_at'].dt.strftime('%Y-%m').nunique()} months, {int(out['posted_at'].isna().sum())} rows without date)")
+    print(f" Non-job groups (triage score < {args.triage_min_score}): {len(non_job)} -> {non_job_csv}")
+    scores = pd.concat([out["triage_score"], non_job["triage_score"]]).value_counts().sort_index()
+    print(" Triage scores: " + ", ".join(f"{k}: {v}" for k, v in scores.items()))
+    print(f" Reposted ads: {int((out['repost_count'] > 1).sum())} ({int(out['repost_count'].sum()) - len(out)} reposts merged, {int((out['repost_channels'] > 1).sum())} across channels)")
+    if append:
+        print(f" Reposts of stored ads: {n_stored_reposts} (stored rows updated in place)")
+    report_normalize_calls("parse_telegram", extra=worker_calls)
+    print(f" Coverage: {coverage_path} ({int(coverage['dropped_duplicates'].sum())} duplicate groups dropped)")
+    print(out[["channel", "source_file", "date_title", "job_title", "company", "location"]].head(10).to_string(index=False))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+from pathlib import Path
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+
+# Telegram's date tooltip, e.g. "15.01.2023 10:20:30 UTC+03:30"
+DATE_TITLE_FORMAT = "%d.%m.%Y %H:%M:%S UTC%z"
+UNKNOWN_MONTH = "unknown"
+
+
+def parse_date_titles(titles: pd.Series) -> pd.Series:
+    # Vectorized tooltip parse to datetime64[UTC]; missing or malformed tooltips become NaT.
+    return pd.to_datetime(titles, format=DATE_TITLE_FORMAT, utc=True, errors="coerce")
+
+
+def content_fingerprint(text: str | None, job_title: str | None, company: str | None) -> int:
+    # 64-bit blake2b of the ad content, as a signed int so it fits an int64 column.
+    key = "\x1f".join([text or "", job_title or "", company or ""])
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+
+def ad_fingerprints(df: pd.DataFrame) -> pd.Series:
+    if "fingerprint" in df.columns:
+        return df["fingerprint"].astype("int64")
+    # Parsed CSVs written before fingerprints existed.
+    return pd.Series(
+        [content_fingerprint(t, j, c) for t, j, c in zip(df["text_norm"].fillna(""), df["job_title"], df["company"])],
+        index=df.index,
+        dtype="int64",
+    )
+
+
+def load_cluster_ids(near_dups_csv: Path, df: pd.DataFrame) -> pd.Series:
+    # near_duplicates.py cluster_id per row of df (one cluster = one vacancy), matched on the
+    # ad fingerprint. Ads it has not seen, or every ad when it has not run, are their own cluster.
+    fps = ad_fingerprints(df)
+    if not Path(near_dups_csv).exists():
+        return fps.rename("cluster_id")
+    dups = pd.read_csv(near_dups_csv, encoding="utf-8-sig", usecols=["fingerprint", "cluster_id"]).drop_duplicates("fingerprint")
+    clusters = pd.Series(dups["cluster_id"].to_numpy(dtype=np.int64), index=pd.Index(dups["fingerprint"].to_numpy(dtype=np.int64)))
+    return fps.map(clusters).fillna(fps).astype("int64").rename("cluster_id")
+
+
+def partition_dir(out_csv: Path) -> Path:
+    return out_csv.with_name(out_csv.stem + ".by_month")
+
+
+def channel_dir(out_csv: Path) -> Path:
+    return out_csv.with_name(out_csv.stem + ".by_channel")
+
+
+def month_keys(posted_at: pd.Series) -> pd.Series:
+    # Partitions are UTC calendar months ("2023-01"); rows without a timestamp go to "unknown".
+    return posted_at.dt.strftime("%Y-%m").fillna(UNKNOWN_MONTH)
+
+
+def write_partitions(df: pd.DataFrame, part_dir: Path, keys: pd.Series, append: bool = False) -> Path:
+    # One CSV per key; a full run replaces the directory, --append extends the matching files.
+    if not append and part_dir.exists():
+        for p in part_dir.glob("*.csv"):
+            p.unlink()
+    part_dir.mkdir(parents=True, exist_ok=True)
+
+    for key, part in df.groupby(keys, sort=True):
+        path = part_dir / f"{key}.csv"
+        if append and path.exists():
+            header = pd.read_csv(path, encoding="utf-8-sig", nrows=0).columns
+            part.reindex(columns=header).to_csv(path, mode="a", header=False, index=False, encoding="utf-8")
+        else:
+            part.to_csv(path, index=False, encoding="utf-8-sig")
+    return part_dir
+
+
+def write_month_partitions(df: pd.DataFrame, out_csv: Path, append: bool = False) -> Path:
+    return write_partitions(df, partition_dir(out_csv), month_keys(df["posted_at"]), append)
+
+
+def write_channel_partitions(df: pd.DataFrame, out_csv: Path, append: bool = False) -> Path:
+    return write_partitions(df, channel_dir(out_csv), df["channel"], append)
+
+
+def to_utc(ts) -> pd.Timestamp | None:
+    if ts is None:
+        return None
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tz is None else ts.tz_convert("UTC")
+
+
+def load_parsed_ads(parsed_csv: Path, start=None, end=None, channels: list[str] | None = None) -> pd.DataFrame:
+    # Rows with start <= posted_at < end (and from `channels`). With a range, only the
+    # overlapping month partitions are read; with channels only, only their partitions.
+    start, end = to_utc(start), to_utc(end)
+    part_dir = partition_dir(parsed_csv)
+    chan_dir = channel_dir(parsed_csv)
+
+    if channels and start is None and end is None and chan_dir.is_dir():
+        frames = [pd.read_csv(chan_dir / f"{c}.csv", encoding="utf-8-sig") for c in channels if (chan_dir / f"{c}.csv").exists()]
+        df = pd.concat(frames, ignore_index=True) if frames else pd.read_csv(parsed_csv, encoding="utf-8-sig", nrows=0)
+    elif (start is not None or end is not None) and part_dir.is_dir():
+        lo = start.strftime("%Y-%m") if start is not None else ""
+        hi = end.strftime("%Y-%m") if end is not None else "9999-99"
+        files = [p for p in sorted(part_dir.glob("*.csv")) if p.stem != UNKNOWN_MONTH and lo <= p.stem <= hi]
+        frames = [pd.read_csv(p, encoding="utf-8-sig") for p in files]
+        df = pd.concat(frames, ignore_index=True) if frames else pd.read_csv(parsed_csv, encoding="utf-8-sig", nrows=0)
+    else:
+        df = pd.read_csv(parsed_csv, encoding="utf-8-sig")
+
+    if "posted_at" in df.columns:
+        df["posted_at"] = pd.to_datetime(df["posted_at"], utc=True, errors="coerce")
+    else:
+        df["posted_at"] = parse_date_titles(df["date_title"])
+
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df["posted_at"] >= start
+    if end is not None:
+        mask &= df["posted_at"] < end
+    if channels and "channel" in df.columns:
+        mask &= df["channel"].isin(channels)
+    return df[mask].reset_index(drop=True)
@@ -2,16 +2,12 @@ from __future__ import annotations
 
 from pathlib import Path
 import re
-import html as htmllib
 import pandas as pd
 import sys
 
-from job_taxonomy import JOB_TITLE_PATTERNS
-
-
-PERSIAN_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹", "0123456789")
-ARABIC_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩", "0123456789")
-ARABIC_LETTERS = str.maketrans({"ي": "ی", "ك": "ک", "ة": "ه", "ۀ": "ه", "ؤ": "و", "إ": "ا", "أ": "ا"})
+from catalog_bundle import describe_bundle, load_catalog_bundle
+from parsed_store import load_cluster_ids
+from text_normalize import normalize_series, normalize_text, report_normalize_calls
 
 
 def configure_stdout():
@@ -22,21 +18,14 @@ def configure_stdout():
         pass
 
 
-def normalize_text(s: str) -> str:
-    s = htmllib.unescape(s or "")
-    s = s.translate(ARABIC_LETTERS).translate(PERSIAN_DIGITS).translate(ARABIC_DIGITS)
-    s = s.replace("\u200c", " ")
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
-
-
 QUOTE_RE = re.compile(r"[«\"]([^«»\"]{2,80})[»\"]")
 TITLE_HINT_RE = re.compile(r"(کارشناس|مدیر|مسئول|کارمند|تحلیل(?:گر)?|حسابدار|معامله(?:\s*گر|گر)|سرپرست|کارآموز|مشاور)")
 
 
-def extract_title_from_text(text_raw: str) -> str | None:
-    t = normalize_text(text_raw or "")
-    candidates = [normalize_text(x) for x in QUOTE_RE.findall(t)]
+def extract_title_from_text(text_raw: str, normalized: bool = False) -> str | None:
+    t = (text_raw or "") if normalized else normalize_text(text_raw or "")
+    # Quoted spans of normalized text only need stripping.
+    candidates = [x.strip() for x in QUOTE_RE.findall(t)]
     if not candidates:
         return None
 
@@ -48,20 +37,8 @@ def extract_title_from_text(text_raw: str) -> str | None:
     return candidates[0]
 
 
-def compile_patterns():
-    compiled = []
-    for it in JOB_TITLE_PATTERNS:
-        compiled.append({
-            "code": it["code"],
-            "family_fa": it["family_fa"],
-            "role_fa": it["role_fa"],
-            "regex": re.compile(it["pattern"], flags=re.IGNORECASE),
-        })
-    return compiled
-
-
-def classify_job(text: str, compiled) -> tuple[str, str, str]:
-    t = normalize_text(text or "")
+def classify_job(text: str, compiled, normalized: bool = False) -> tuple[str, str, str]:
+    t = (text or "") if normalized else normalize_text(text or "")
     for it in compiled:
         if it["regex"].search(t):
             return it["code"], it["family_fa"], it["role_fa"]
@@ -76,6 +53,8 @@ def main():
         raise FileNotFoundError(f"Input CSV not found: {in_csv}")
 
     df = pd.read_csv(in_csv, encoding="utf-8-sig")
+    # Near-duplicate reposts of one vacancy share a cluster_id (near_duplicates.py).
+    cluster_ids = load_cluster_ids(root / "outputs" / "ads_near_duplicates.csv", df)
 
     if "text_raw" not in df.columns:
         df["text_raw"] = ""
@@ -84,24 +63,30 @@ def main():
         df["job_title"] = ""
 
     
-    jt = df["job_title"].fillna("").astype(str)
-    raw = df["text_raw"].fillna("").astype(str)
-
-    def fix_title(row_job, row_text):
-        j = normalize_text(row_job)
+    jt = normalize_series(df["job_title"])
+    # Parsed CSVs carry text_norm; only older ones need the raw text normalized here.
+    if "text_norm" in df.columns:
+        text_norm = df["text_norm"].fillna("").astype(str)
+    else:
+        text_norm = normalize_series(df["text_raw"])
+
+    def fix_title(j, row_text):
         if len(j) < 3 or j in {"الف", "ا", "ب"}:
-            q = extract_title_from_text(row_text)
+            q = extract_title_from_text(row_text, normalized=True)
             return q if q else j
         return j
 
-    df["job_title_clean"] = [fix_title(j, t) for j, t in zip(jt.tolist(), raw.tolist())]
+    df["job_title_clean"] = [fix_title(j, t) for j, t in zip(jt.tolist(), text_norm.tolist())]
 
-    compiled = compile_patterns()
+    catalog = load_catalog_bundle(sections=["jobs"])
+    compiled = catalog["jobs"]
+    print(f" Job titles from {describe_bundle(catalog)}")
 
     
-    source_text = (df["job_title_clean"].fillna("") + " " + df["text_raw"].fillna("")).astype(str)
+    # Both parts are normalized already, so the joined text is too.
+    source_text = (df["job_title_clean"].fillna("") + " " + text_norm).str.strip()
 
-    out = source_text.map(lambda x: classify_job(x, compiled))
+    out = source_text.map(lambda x: classify_job(x, compiled, normalized=True))
     df["job_code"] = out.map(lambda x: x[0])
     df["خانواده_شغلی"] = out.map(lambda x: x[1])
     df["عنوان_شغل_استاندارد"] = out.map(lambda x: x[2])
@@ -114,6 +99,9 @@ def main():
         .reset_index()
     )
     role_counts.columns = ["عنوان_شغل_استاندارد", "تعداد_آگهی"]
+    role_counts["تعداد_موقعیت_شغلی"] = role_counts["عنوان_شغل_استاندارد"].map(
+        cluster_ids.groupby(df["عنوان_شغل_استاندارد"].fillna("سایر")).nunique()
+    )
 
     
     family_counts = (
@@ -123,6 +111,9 @@ def main():
         .reset_index()
     )
     family_counts.columns = ["خانواده_شغلی", "تعداد_آگهی"]
+    family_counts["تعداد_موقعیت_شغلی"] = family_counts["خانواده_شغلی"].map(
+        cluster_ids.groupby(df["خانواده_شغلی"].fillna("سایر")).nunique()
+    )
 
     
     unknown_samples = (
@@ -151,6 +142,7 @@ def main():
     print(f" Saved: {out_roles}")
     print(f" Saved: {out_fams}")
     print(f" Saved: {out_unknown}")
+    report_normalize_calls("refine_job_titles")
 
     print("\nTop 25 roles:")
     print(role_counts.head(25).to_string(index=False))
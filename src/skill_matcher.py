@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+from itertools import product
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# An alternative is treated as a literal set only if it expands to at most this many strings.
+MAX_EXPANSIONS = 256
+LOOKAROUND_PREFIXES = ("(?<!", "(?<=", "(?!", "(?=")
+# The only non-ASCII characters that re.IGNORECASE matches against ASCII letters
+# (i, i, s, k); rows containing them are scanned case-insensitively.
+FOLD_CHARS_RE = re.compile(r"[\u0130\u0131\u017f\u212a]")
+
+
+def split_alternatives(pattern: str) -> list[str]:
+    # Top-level "|" split that respects groups, character classes and escapes.
+    parts, depth, in_class, start, i = [], 0, False, 0, 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if in_class:
+            in_class = ch != "]"
+        elif ch == "[":
+            in_class = True
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "|" and depth == 0:
+            parts.append(pattern[start:i])
+            start = i + 1
+        i += 1
+    parts.append(pattern[start:])
+    return parts
+
+
+def _group_end(pattern: str, i: int) -> int:
+    # Index of the ")" closing the group opened at pattern[i].
+    depth, in_class = 0, False
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if in_class:
+            in_class = ch != "]"
+        elif ch == "[":
+            in_class = True
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    raise ValueError(f"Unbalanced group in pattern: {pattern}")
+
+
+def expand_literals(alt: str, skip_lookarounds: bool = False) -> list[str] | None:
+    # All strings an alternative can match in normalized text, or None if it needs the
+    # regex engine. normalize_text collapses whitespace to single spaces, so `\s*` can
+    # only match "" or " ". With skip_lookarounds the assertions are dropped, which gives
+    # strings every match must contain (a prefilter), not an exact expansion.
+    pieces: list[list[str]] = []
+    i = 0
+    while i < len(alt):
+        ch = alt[i]
+        if ch == "\\":
+            nxt = alt[i + 1:i + 2]
+            if nxt == "s" and alt[i + 2:i + 3] == "*":
+                pieces.append(["", " "])
+                i += 3
+                continue
+            if not nxt or nxt.isalnum():
+                return None
+            pieces.append([nxt])
+            i += 2
+        elif ch == "(":
+            end = _group_end(alt, i)
+            inner = alt[i + 1:end]
+            if alt.startswith(LOOKAROUND_PREFIXES, i):
+                if not skip_lookarounds:
+                    return None
+                i = end + 1
+                continue
+            if inner.startswith("?:"):
+                inner = inner[2:]
+            elif inner.startswith("?"):
+                return None
+            options: list[str] = []
+            for sub in split_alternatives(inner):
+                exp = expand_literals(sub, skip_lookarounds)
+                if exp is None:
+                    return None
+                options.extend(exp)
+            pieces.append(options)
+            i = end + 1
+        elif ch == "?":
+            if not pieces:
+                return None
+            pieces[-1] = pieces[-1] + [""]
+            i += 1
+        elif ch in ".^$*+{}[]|":
+            return None
+        else:
+            pieces.append([ch])
+            i += 1
+
+    n = 1
+    for p in pieces:
+        n *= len(p)
+        if n > MAX_EXPANSIONS:
+            return None
+    return list(dict.fromkeys("".join(t) for t in product(*pieces)))
+
+
+def trie_regex(words: list[str]) -> str:
+    # Prefix-factored alternation. Optional branches are greedy, so at a given position
+    # the engine reports the longest word that matches there.
+    trie: dict = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def render(node: dict) -> str:
+        end = "" in node
+        branches = [re.escape(ch) + render(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return "(?:" + body + ")?" if end else body
+
+    return render(trie)
+
+
+def compile_skill_matcher(compiled: list[dict]) -> dict:
+    # One literal scan for the whole catalog plus per-alternative regexes for the rest.
+    # Targets 0..n_skills-1 are direct skill hits; target n_skills + k means "regex
+    # alternative k may match here" and is confirmed with that alternative's regex.
+    # Only the pattern sources are kept (the matcher is cached by catalog_bundle, and
+    # unpickling a re.Pattern compiles it); match_skills compiles what it uses.
+    skills = [c["skill"] for c in compiled]
+    literal_targets: dict[str, set[int]] = {}
+    regex_alts: list[dict] = []
+
+    for s_idx, c in enumerate(compiled):
+        for alt in split_alternatives(c["pattern"]):
+            exact = expand_literals(alt)
+            if exact is not None and "" not in exact:
+                for lit in exact:
+                    literal_targets.setdefault(lit.lower(), set()).add(s_idx)
+                continue
+
+            triggers = expand_literals(alt, skip_lookarounds=True)
+            if triggers is not None and "" in triggers:
+                triggers = None
+            target = len(skills) + len(regex_alts)
+            regex_alts.append({
+                "skill_idx": s_idx,
+                "pattern": alt,
+                "prefiltered": triggers is not None,
+            })
+            for lit in triggers or []:
+                literal_targets.setdefault(lit.lower(), set()).add(target)
+
+    # Literals matched at the same position are all prefixes of the longest one, so each
+    # literal carries the targets of its prefixes. Stored CSR: targets of word w are
+    # closure_targets[closure_ptr[w]:closure_ptr[w + 1]], and closure_lengths holds the
+    # length of the longest prefix giving each target (the span of that hit).
+    words = sorted(literal_targets)
+    closure = []
+    for w in words:
+        targets: dict[int, int] = {}
+        for k in range(1, len(w) + 1):
+            for t in literal_targets.get(w[:k], ()):
+                targets[t] = k
+        closure.append(sorted(targets.items()))
+    closure_ptr = np.zeros(len(words) + 1, dtype=np.int64)
+    np.cumsum([len(t) for t in closure], out=closure_ptr[1:])
+
+    # Scanning lowercased text case-sensitively is much faster than IGNORECASE; it is exact
+    # as long as every cased literal character is ASCII (rows with FOLD_CHARS excepted).
+    ascii_case = all(ch.isascii() or ch.lower() == ch.upper() for w in words for ch in w)
+    scan = "(?=(" + trie_regex(words) + "))"
+    return {
+        "skills": skills,
+        "words": {w: i for i, w in enumerate(words)},
+        "scan": scan if words and ascii_case else None,
+        "scan_ci": scan if words else None,
+        "closure_ptr": closure_ptr,
+        "closure_targets": np.array([t for ts in closure for t, _ in ts], dtype=np.int64),
+        "closure_lengths": np.array([k for ts in closure for _, k in ts], dtype=np.int64),
+        "regex_alts": regex_alts,
+    }
+
+
+def _word_id(matcher: dict, hit: str) -> int:
+    found = matcher["words"].get(hit.lower())
+    if found is None:
+        # Case-insensitive matches whose lower() differs from the catalog spelling (FOLD_CHARS
+        # rows only, so compiling the literals here on demand is cheap overall).
+        found = next(i for i, w in enumerate(matcher["words"]) if re.fullmatch(re.escape(w), hit, flags=re.IGNORECASE))
+    return found
+
+
+def match_skills(matcher: dict, texts: pd.Series, spans: bool = False):
+    # Boolean ad x skill matrix, identical to text.str.contains(pattern) per skill as long
+    # as `texts` is normalize_text output, from a single pass over each ad. With spans=True
+    # also returns every hit as (ad, skill, start, end) arrays: one span per literal hit
+    # (the longest literal of the skill starting there) plus every match of a regex
+    # alternative in the ads where it was confirmed. Scans and alternatives are compiled
+    # here, and only those some row needs (re caches them across calls).
+    texts = texts.fillna("").astype(str)
+    values = texts.tolist()
+    n_skills = len(matcher["skills"])
+    n_targets = n_skills + len(matcher["regex_alts"])
+    hits = np.zeros((len(texts), n_targets), dtype=bool)
+    found_spans: dict[str, list] = {"ad": [], "skill": [], "start": [], "end": []}
+
+    if matcher["scan_ci"] is not None:
+        hit_rows: list[int] = []
+        hit_words: list[int] = []
+        hit_starts: list[int] = []
+
+        def scan_rows(scan, rows, texts_by_row, word_id):
+            # Presence only needs distinct words per ad; spans need every position. Offsets
+            # found in lowercased text hold for the original: only U+0130 changes length
+            # under lower(), and it is one of FOLD_CHARS, so those rows are never lowercased.
+            for row in rows:
+                if spans:
+                    for m in scan.finditer(texts_by_row(row)):
+                        hit_rows.append(row)
+                        hit_words.append(word_id(m.group(1)))
+                        hit_starts.append(m.start())
+                else:
+                    found = {word_id(h) for h in scan.findall(texts_by_row(row))}
+                    hit_rows.extend([row] * len(found))
+                    hit_words.extend(found)
+
+        if matcher["scan"] is not None:
+            folded = texts.str.contains(FOLD_CHARS_RE)
+            lowered = texts.str.lower().where(~folded, "").tolist()
+            scan_rows(re.compile(matcher["scan"]), range(len(lowered)), lowered.__getitem__, matcher["words"].__getitem__)
+        else:
+            folded = pd.Series(True, index=texts.index)
+        folded_rows = np.flatnonzero(folded.to_numpy()).tolist()
+        if folded_rows:
+            scan_rows(re.compile(matcher["scan_ci"], flags=re.IGNORECASE), folded_rows, values.__getitem__,
+                      lambda h: _word_id(matcher, h))
+
+        # Expand (row, word) pairs to (row, target) through the closure CSR.
+        ptr = matcher["closure_ptr"]
+        hit_words_arr = np.asarray(hit_words, dtype=np.int64)
+        n = ptr[hit_words_arr + 1] - ptr[hit_words_arr]
+        starts = np.repeat(ptr[hit_words_arr] - np.cumsum(n) + n, n) + np.arange(n.sum())
+        rows = np.repeat(np.asarray(hit_rows, dtype=np.int64), n)
+        cols = matcher["closure_targets"][starts]
+        hits[rows, cols] = True
+        if spans:
+            direct = cols < n_skills
+            begin = np.repeat(np.asarray(hit_starts, dtype=np.int64), n)[direct]
+            found_spans["ad"].append(rows[direct])
+            found_spans["skill"].append(cols[direct])
+            found_spans["start"].append(begin)
+            found_spans["end"].append(begin + matcher["closure_lengths"][starts][direct])
+
+    for k, alt in enumerate(matcher["regex_alts"]):
+        col = n_skills + k
+        rows = np.flatnonzero(hits[:, col]) if alt["prefiltered"] else np.arange(len(texts))
+        if not len(rows):
+            continue
+        regex = re.compile(alt["pattern"], flags=re.IGNORECASE)
+        if spans:
+            confirmed = []
+            for r in rows.tolist():
+                matched = [m.span() for m in regex.finditer(values[r])]
+                if matched:
+                    confirmed.append(r)
+                    found_spans["ad"].append(np.full(len(matched), r, dtype=np.int64))
+                    found_spans["skill"].append(np.full(len(matched), alt["skill_idx"], dtype=np.int64))
+                    found_spans["start"].append(np.array([b for b, _ in matched], dtype=np.int64))
+                    found_spans["end"].append(np.array([e for _, e in matched], dtype=np.int64))
+        else:
+            search = regex.search
+            confirmed = [r for r in rows.tolist() if search(values[r]) is not None]
+        hits[confirmed, alt["skill_idx"]] = True
+
+    matrix = pd.DataFrame(hits[:, :n_skills], index=texts.index, columns=matcher["skills"])
+    if not spans:
+        return matrix
+    return matrix, {name: np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+                    for name, parts in found_spans.items()}
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+# extract_skills writes one CSR matrix per skills column, e.g. "skills_extracted".
+SKILL_MATRIX_NAMES = ["skills_extracted", "skills_extracted_fine", "skills_extracted_parents"]
+
+
+def skills_sidecar_path(matrix_path: Path) -> Path:
+    return matrix_path.with_name(matrix_path.stem + ".skills.csv")
+
+
+def to_csr(matrix: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    # Boolean ad x skill frame -> (indptr, indices); skills of ad i are indices[indptr[i]:indptr[i + 1]].
+    values = matrix.to_numpy(dtype=bool)
+    rows, cols = np.nonzero(values)
+    indptr = np.zeros(values.shape[0] + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=values.shape[0]), out=indptr[1:])
+    return indptr, cols.astype(np.int32)
+
+
+def save_skill_matrices(path: Path, matrices: dict[str, pd.DataFrame], ad_key: pd.Series, meta: pd.DataFrame) -> Path:
+    # One compressed npz holding every matrix, with rows keyed by the build_dataset ad key,
+    # plus a CSV sidecar mapping (matrix, col) to the skill and its catalog metadata.
+    arrays = {"ad_key": ad_key.astype(str).to_numpy(dtype=str)}
+    sidecar = []
+    for name, matrix in matrices.items():
+        arrays[f"{name}.indptr"], arrays[f"{name}.indices"] = to_csr(matrix)
+        sidecar.append(pd.DataFrame({"matrix": name, "col": np.arange(matrix.shape[1]), "skill": list(matrix.columns)}))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp.npz")
+    np.savez_compressed(tmp, **arrays)
+    tmp.replace(path)
+
+    skills = pd.concat(sidecar, ignore_index=True).merge(meta, on="skill", how="left")
+    skills.to_csv(skills_sidecar_path(path), index=False, encoding="utf-8-sig")
+    return path
+
+
+def load_skill_matrix(path: Path, name: str = "skills_extracted") -> dict | None:
+    # None when the artifact or the requested matrix is missing (older runs).
+    path = Path(path)
+    sidecar = skills_sidecar_path(path)
+    if not path.exists() or not sidecar.exists():
+        return None
+    with np.load(path) as z:
+        if f"{name}.indptr" not in z.files:
+            return None
+        store = {
+            "indptr": z[f"{name}.indptr"],
+            "indices": z[f"{name}.indices"],
+            "ad_key": z["ad_key"],
+        }
+    skills = pd.read_csv(sidecar, encoding="utf-8-sig")
+    store["skills"] = skills[skills["matrix"].eq(name)].sort_values("col").reset_index(drop=True)
+    return store
+
+
+def align_rows(store: dict, ad_key: pd.Series) -> np.ndarray | None:
+    # Matrix row for each key (first occurrence, like build_dataset), or None if any key
+    # is unknown, i.e. the matrix is older than the frame it is used with.
+    keys = pd.Index(store["ad_key"])
+    first = ~keys.duplicated()
+    pos = pd.Index(keys[first]).get_indexer(ad_key.astype(str))
+    if (pos < 0).any():
+        return None
+    return np.flatnonzero(first)[pos]
+
+
+def align_ad_rows(store: dict, ad_key: pd.Series, ad_id: pd.Series) -> np.ndarray | None:
+    # align_rows, but only when each ad id maps to a single matrix row, so counting
+    # distinct ad ids per skill is counting matrix rows.
+    rows = align_rows(store, ad_key)
+    if rows is None:
+        return None
+    pairs = pd.DataFrame({"ad_id": ad_id.to_numpy(), "row": rows}).drop_duplicates()
+    return rows if pairs["ad_id"].is_unique else None
+
+
+def relabel_skills(store: dict, labels: pd.Series) -> dict:
+    # Store over coarser labels, e.g. each skill's group: a row has a label once if any
+    # of its skills maps to it. labels[k] is the label of column k; NaN drops the column.
+    codes, uniq = pd.factorize(labels)
+    n_rows, n_labels = len(store["indptr"]) - 1, max(len(uniq), 1)
+    owner = np.repeat(np.arange(n_rows, dtype=np.int64), np.diff(store["indptr"]))
+    label = codes[store["indices"]]
+    keys = np.unique(owner[label >= 0] * n_labels + label[label >= 0])
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys // n_labels, minlength=n_rows), out=indptr[1:])
+    return {
+        "indptr": indptr,
+        "indices": (keys % n_labels).astype(np.int32),
+        "ad_key": store["ad_key"],
+        "skills": pd.DataFrame({"skill": np.asarray(uniq, dtype=object)}),
+    }
+
+
+def row_entries(store: dict, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # (position in `rows`, skill col) for every non-zero of the selected rows.
+    start, stop = store["indptr"][rows], store["indptr"][rows + 1]
+    n = stop - start
+    owner = np.repeat(np.arange(len(rows)), n)
+    offsets = np.repeat(start - np.cumsum(n) + n, n) + np.arange(n.sum())
+    return owner, store["indices"][offsets].astype(np.int64)
+
+
+def skill_counts(store: dict, rows: np.ndarray | None = None) -> np.ndarray:
+    # Ads per skill column over all rows or the selected ones.
+    n_skills = len(store["skills"])
+    if rows is None:
+        return np.bincount(store["indices"], minlength=n_skills)
+    _, cols = row_entries(store, rows)
+    return np.bincount(cols, minlength=n_skills)
+
+
+def group_skill_counts(store: dict, rows: np.ndarray, group_codes: np.ndarray, n_groups: int) -> np.ndarray:
+    # (n_groups x n_skills) ads per group and skill; group_codes[i] is the group of rows[i].
+    n_skills = len(store["skills"])
+    owner, cols = row_entries(store, rows)
+    flat = np.bincount(group_codes[owner] * n_skills + cols, minlength=n_groups * n_skills)
+    return flat.reshape(n_groups, n_skills)
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+from pathlib import Path
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from build_dataset import build_ad_key
+
+
+# extract_skills writes where each skill matched, next to the presence matrix:
+# one row per (ad, skill, start, end), offsets into the ad's text_norm.
+SPAN_COLUMNS = ["ad", "skill", "start", "end"]
+
+
+def configure_stdout():
+    try:
+        if hasattr(sys.stdout, "reconfigure"):
+            sys.stdout.reconfigure(encoding="utf-8", errors="replace")
+    except Exception:
+        pass
+
+
+def build_span_index(found: dict[str, np.ndarray], n_ads: int, n_skills: int) -> dict[str, np.ndarray]:
+    # match_skills(..., spans=True) output -> columnar int32 spans sorted by (ad, skill, start),
+    # one per start (the longest). Spans of ad i are rows ad_ptr[i]:ad_ptr[i + 1]; spans of
+    # skill k are rows by_skill[skill_ptr[k]:skill_ptr[k + 1]], ordered by ad and start.
+    order = np.lexsort((-found["end"], found["start"], found["skill"], found["ad"]))
+    spans = {name: np.asarray(found[name], dtype=np.int32)[order] for name in SPAN_COLUMNS}
+    keep = np.ones(len(order), dtype=bool)
+    keep[1:] = (np.diff(spans["ad"]) != 0) | (np.diff(spans["skill"]) != 0) | (np.diff(spans["start"]) != 0)
+    spans = {name: arr[keep] for name, arr in spans.items()}
+
+    spans["ad_ptr"] = np.zeros(n_ads + 1, dtype=np.int64)
+    np.cumsum(np.bincount(spans["ad"], minlength=n_ads), out=spans["ad_ptr"][1:])
+    spans["by_skill"] = np.argsort(spans["skill"], kind="stable").astype(np.int32)
+    spans["skill_ptr"] = np.zeros(n_skills + 1, dtype=np.int64)
+    np.cumsum(np.bincount(spans["skill"], minlength=n_skills), out=spans["skill_ptr"][1:])
+    return spans
+
+
+def save_span_index(path: Path, spans: dict[str, np.ndarray], ad_key: pd.Series, skills: list[str]) -> Path:
+    # Rows are keyed like the skill matrix (build_dataset ad key) and skill ids are its
+    # "skills_extracted" columns, stored here too so the file stands on its own.
+    arrays = dict(spans)
+    arrays["ad_key"] = ad_key.astype(str).to_numpy(dtype=str)
+    arrays["skills"] = np.asarray(skills, dtype=str)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp.npz")
+    np.savez_compressed(tmp, **arrays)
+    tmp.replace(path)
+    return path
+
+
+def load_span_index(path: Path) -> dict[str, np.ndarray] | None:
+    # None when the artifact is missing (older runs).
+    path = Path(path)
+    if not path.exists():
+        return None
+    with np.load(path) as z:
+        return {name: z[name] for name in z.files}
+
+
+def ad_spans(spans: dict[str, np.ndarray], row: int) -> pd.DataFrame:
+    lo, hi = spans["ad_ptr"][row], spans["ad_ptr"][row + 1]
+    return pd.DataFrame({name: spans[name][lo:hi] for name in SPAN_COLUMNS})
+
+
+def skill_spans(spans: dict[str, np.ndarray], skill_id: int) -> pd.DataFrame:
+    rows = spans["by_skill"][spans["skill_ptr"][skill_id]:spans["skill_ptr"][skill_id + 1]]
+    return pd.DataFrame({name: spans[name][rows] for name in SPAN_COLUMNS})
+
+
+def span_snippets(texts: list[str], found: pd.DataFrame, width: int = 40) -> pd.DataFrame:
+    # Matched text and a context window around it, the match wrapped in [ ].
+    matched, context = [], []
+    for ad, start, end in zip(found["ad"].tolist(), found["start"].tolist(), found["end"].tolist()):
+        text = texts[ad]
+        matched.append(text[start:end])
+        context.append(text[max(0, start - width):start] + "[" + text[start:end] + "]" + text[end:end + width])
+    return found.assign(matched=matched, context=context)
+
+
+def main():
+    configure_stdout()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--spans", type=str, default="outputs/ads_skill_spans.npz")
+    parser.add_argument("--input", type=str, default="outputs/ads_with_skills.csv", help="CSV with text_norm, for the context windows")
+    parser.add_argument("--skill", type=str, required=True, help="Skill name, e.g. CM_Trading_Cert")
+    parser.add_argument("--limit", type=int, default=20, help="Number of hits to print in context")
+    parser.add_argument("--width", type=int, default=40, help="Context characters on each side of a hit")
+    args = parser.parse_args()
+
+    root = Path(__file__).resolve().parents[1]
+    spans_path = (root / args.spans).resolve()
+    in_csv = (root / args.input).resolve()
+
+    spans = load_span_index(spans_path)
+    if spans is None:
+        raise FileNotFoundError(f"Span index not found (run extract_skills.py): {spans_path}")
+    skills = spans["skills"].tolist()
+    if args.skill not in skills:
+        raise ValueError(f"Unknown skill: {args.skill}")
+
+    df = pd.read_csv(in_csv, encoding="utf-8-sig")
+    # Span rows are positions in the frame extract_skills saved, so the keys must match row for row.
+    ad_key = build_ad_key(df).astype(str).to_numpy(dtype=str)
+    if len(ad_key) != len(spans["ad_key"]) or (ad_key != spans["ad_key"]).any():
+        raise ValueError(f"Span index is out of date for {in_csv}; re-run extract_skills.py")
+
+    found = span_snippets(df["text_norm"].fillna("").astype(str).tolist(), skill_spans(spans, skills.index(args.skill)), args.width)
+    print(f" {args.skill}: {len(found)} hits in {found['ad'].nunique()} ads")
+    if not len(found):
+        return
+
+    print("\nPhrasings:")
+    print(found["matched"].str.lower().value_counts().rename_axis("matched").reset_index(name="hits").to_string(index=False))
+    print("\nIn context:")
+    for row in found.head(args.limit).itertuples():
+        print(f" ad {row.ad} [{row.start}:{row.end}] {row.context}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator
+import html as htmllib
+import json
+import re
+
+import numpy as np
+
+from parse_cache import ids_known
+
+
+MESSAGES_KEY_RE = re.compile(r'"messages"\s*:\s*\[')
+SKIP_RE = re.compile(r"[\s,]*")
+
+# Telegram Desktop joins consecutive posts of one sender sent within 15 minutes.
+JOIN_WITHIN_SECONDS = 900
+
+
+def iter_json_messages(json_path: Path, block_size: int = 1 << 20) -> Iterator[dict]:
+    # Decode the top-level "messages" array one object at a time instead of json.load().
+    decoder = json.JSONDecoder()
+    with open(json_path, encoding="utf-8", errors="ignore") as fh:
+        buf = ""
+        while True:
+            m = MESSAGES_KEY_RE.search(buf)
+            if m:
+                buf = buf[m.end():]
+                break
+            block = fh.read(block_size)
+            if not block:
+                return
+            buf = buf[-64:] + block
+
+        pos = 0
+        while True:
+            pos = SKIP_RE.match(buf, pos).end()
+            if pos >= len(buf):
+                block = fh.read(block_size)
+                if not block:
+                    return
+                buf, pos = buf[pos:] + block, 0
+                continue
+            if buf[pos] == "]":
+                return
+
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                block = fh.read(block_size)
+                if not block:
+                    raise
+                buf, pos = buf[pos:] + block, 0
+                continue
+
+            yield obj
+            pos = end
+            if pos > block_size:
+                buf, pos = buf[pos:], 0
+
+
+def json_text(text) -> str:
+    # Mirror the HTML export: every line and every entity is its own stripped text node.
+    parts = text if isinstance(text, list) else [text or ""]
+    pieces = []
+    for part in parts:
+        s = part.get("text", "") if isinstance(part, dict) else str(part)
+        pieces += [p.strip() for p in s.split("\n")]
+    txt = "\n".join(p for p in pieces if p)
+    txt = htmllib.unescape(txt)
+    txt = re.sub(r"\n{3,}", "\n\n", txt)
+    return txt.strip()
+
+
+def json_date_title(msg: dict) -> str | None:
+    # Same format as the HTML tooltip: "15.01.2023 10:20:30 UTC+03:30"
+    date = msg.get("date")
+    if not date:
+        return None
+    local = datetime.fromisoformat(date)
+    title = local.strftime("%d.%m.%Y %H:%M:%S")
+
+    unix = msg.get("date_unixtime")
+    if unix:
+        utc = datetime.fromtimestamp(int(unix), tz=timezone.utc).replace(tzinfo=None)
+        offset = round((local - utc).total_seconds() / 60)
+        sign = "+" if offset >= 0 else "-"
+        hours, minutes = divmod(abs(offset), 60)
+        title += f" UTC{sign}{hours:02d}:{minutes:02d}"
+    return title
+
+
+def joins_previous(msg: dict, prev: dict | None) -> bool:
+    if prev is None or prev.get("type") != "message":
+        return False
+    if msg.get("from_id") != prev.get("from_id") or msg.get("via_bot") != prev.get("via_bot"):
+        return False
+    if msg.get("forwarded_from") != prev.get("forwarded_from"):
+        return False
+    if str(msg.get("date", ""))[:10] != str(prev.get("date", ""))[:10]:
+        return False
+    try:
+        delta = abs(int(msg["date_unixtime"]) - int(prev["date_unixtime"]))
+    except (KeyError, TypeError, ValueError):
+        return False
+    return delta <= (1 if msg.get("forwarded_from") else JOIN_WITHIN_SECONDS)
+
+
+def build_json_group(msgs: list[dict], group_index: int) -> dict:
+    head = msgs[0]
+    texts = [json_text(m.get("text")) for m in msgs]
+    ids = [f"message{m['id']}" for m in msgs if "id" in m]
+    return {
+        "group_index": group_index,
+        "message_ids": ",".join(ids),
+        "dt_title": json_date_title(head),
+        "from_name": head.get("from"),
+        "text": "\n\n".join([t for t in texts if t]).strip(),
+    }
+
+
+def iter_json_groups(json_path: Path, skip_ids: np.ndarray | None = None, stats: dict | None = None) -> Iterator[dict]:
+    # Rebuild the HTML default/joined grouping from sender + timestamp continuity.
+    stats = stats if stats is not None else {}
+    for key in ("default_messages", "joined_messages", "groups", "skipped"):
+        stats.setdefault(key, 0)
+    pending: list[dict] = []
+    prev = None
+
+    def close_group():
+        ids = [f"message{m.get('id')}" for m in pending]
+        if skip_ids is not None and ids_known(skip_ids, ids):
+            stats["skipped"] += 1
+            group = None
+        else:
+            group = build_json_group(pending, stats["groups"])
+        stats["groups"] += 1
+        return group
+
+    for msg in iter_json_messages(json_path):
+        joined = joins_previous(msg, prev)
+        prev = msg
+        if msg.get("type") != "message":
+            continue
+        stats["default_messages"] += 1
+        stats["joined_messages"] += joined
+
+        if pending and joined:
+            pending.append(msg)
+            continue
+
+        if pending:
+            group = close_group()
+            if group is not None:
+                yield group
+        pending = [msg]
+
+    if pending:
+        group = close_group()
+        if group is not None:
+            yield group
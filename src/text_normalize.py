@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from collections import Counter
+import html as htmllib
+import re
+
+import pandas as pd
+
+
+PERSIAN_DIGITS = dict(zip("۰۱۲۳۴۵۶۷۸۹", "0123456789"))
+ARABIC_DIGITS = dict(zip("٠١٢٣٤٥٦٧٨٩", "0123456789"))
+ARABIC_LETTERS = {"ي": "ی", "ك": "ک", "ة": "ه", "ۀ": "ه", "ؤ": "و", "إ": "ا", "أ": "ا"}
+ZWNJ = {"\u200c": " "}
+QUOTES = {'"': " ", "«": " ", "»": " "}
+
+# One merged table per variant. The source characters of the parts are disjoint and no
+# replacement is itself a source, so one translate equals the old chained translates.
+NORMALIZE_TABLES: dict[str, dict[int, str]] = {
+    "default": str.maketrans({**ARABIC_LETTERS, **PERSIAN_DIGITS, **ARABIC_DIGITS, **ZWNJ}),
+    # Location matching also treats quotes as separators.
+    "location": str.maketrans({**ARABIC_LETTERS, **PERSIAN_DIGITS, **ARABIC_DIGITS, **ZWNJ, **QUOTES}),
+}
+
+SPACE_RE = re.compile(r"\s+")
+
+# Texts normalized in this process: "scalar" counts normalize_text calls, "batch" counts
+# rows passed through normalize_series. Stages print it to spot redundant normalization.
+NORMALIZE_CALLS: Counter = Counter()
+
+
+def normalize_text(s: str, variant: str = "default") -> str:
+    NORMALIZE_CALLS["scalar"] += 1
+    s = htmllib.unescape(s or "")
+    s = s.translate(NORMALIZE_TABLES[variant])
+    return SPACE_RE.sub(" ", s).strip()
+
+
+def fold_text(s: str | None) -> str:
+    # normalize_text without html.unescape and the call counter, cheap enough to run on
+    # every group before triage. Equal to normalize_text unless the text still holds html
+    # entities; the parsers have already unescaped message text once.
+    return " ".join((s or "").translate(NORMALIZE_TABLES["default"]).split())
+
+
+def normalize_series(values: pd.Series, variant: str = "default") -> pd.Series:
+    # Column-level normalize_text: missing values become "", and html.unescape only runs
+    # on the rows that contain an entity at all.
+    NORMALIZE_CALLS["batch"] += len(values)
+    s = values.fillna("").astype(str)
+    has_entity = s.str.contains("&", regex=False)
+    if has_entity.any():
+        s = s.where(~has_entity, s[has_entity].map(htmllib.unescape))
+    s = s.str.translate(NORMALIZE_TABLES[variant])
+    return s.str.replace(SPACE_RE, " ", regex=True).str.strip()
+
+
+def normalize_call_count() -> int:
+    return NORMALIZE_CALLS["scalar"] + NORMALIZE_CALLS["batch"]
+
+
+def report_normalize_calls(stage: str, extra: int = 0) -> None:
+    # `extra`: calls made in worker processes, which have their own counters.
+    print(
+        f" [{stage}] normalize calls: {normalize_call_count() + extra} texts "
+        f"({NORMALIZE_CALLS['scalar']} scalar, {NORMALIZE_CALLS['batch']} batch rows in this process)"
+    )
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+from itertools import chain
+from pathlib import Path
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from parsed_store import ad_fingerprints
+
+
+# Bump when TOKEN_RE or the artifact layout changes.
+TOKENIZER_VERSION = 2
+MANIFEST_NAME = "manifest.json"
+
+# Persian/Arabic letters and marks, without the Arabic-Indic and Persian digit blocks.
+PERSIAN_LETTERS = r"\u0621-\u065F\u0670-\u06D3\u06D5\u06FA-\u06FF"
+
+# One alternative per script: Persian words (text_norm has ZWNJ replaced by a space, so
+# "می‌شود" is two tokens), Latin words and acronyms keeping inner dots/ampersands and
+# trailing +/# ("asp.net", "r&d", "c++", "c#"), numbers keeping decimal and date
+# separators ("2.5", "1402/05/01").
+TOKEN_RE = re.compile(
+    rf"[{PERSIAN_LETTERS}]+"
+    r"|[a-z][a-z0-9]*(?:[.&][a-z0-9]+)*[+#]*"
+    r"|\d+(?:[./]\d+)*"
+)
+
+
+def configure_stdout():
+    try:
+        if hasattr(sys.stdout, "reconfigure"):
+            sys.stdout.reconfigure(encoding="utf-8", errors="replace")
+    except Exception:
+        pass
+
+
+def tokenize_text(text: str) -> list[str]:
+    # Latin is lowercased; Persian has no case and text_norm already unified its letters.
+    return TOKEN_RE.findall((text or "").lower())
+
+
+def tokenize_series(texts: pd.Series) -> list[list[str]]:
+    return texts.fillna("").astype(str).str.lower().str.findall(TOKEN_RE).tolist()
+
+
+def build_token_corpus(texts: pd.Series) -> dict[str, np.ndarray]:
+    # CSR layout: the tokens of ad i are ids[offsets[i]:offsets[i + 1]], in text order.
+    # Token ids are ordered by corpus frequency (ties by first occurrence), so id 0 is
+    # the most common token. The inverted index is the transpose: the ads containing
+    # token t are token_ads[token_ptr[t]:token_ptr[t + 1]], ascending.
+    tokens = tokenize_series(texts)
+    lengths = np.fromiter((len(t) for t in tokens), dtype=np.int64, count=len(tokens))
+    offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    codes, uniques = pd.factorize(pd.Series(list(chain.from_iterable(tokens)), dtype=object), sort=False)
+    counts = np.bincount(codes, minlength=len(uniques))
+    order = np.argsort(-counts, kind="stable")
+    remap = np.empty(len(order), dtype=np.int32)
+    remap[order] = np.arange(len(order), dtype=np.int32)
+    ids = remap[codes] if len(codes) else np.empty(0, dtype=np.int32)
+
+    # Documents per token: unique (ad, token) pairs, sorted by ad.
+    ad_of = np.repeat(np.arange(len(tokens), dtype=np.int64), lengths)
+    pairs = np.unique(ad_of * max(len(order), 1) + ids)
+    pair_tokens = pairs % max(len(order), 1)
+    n_ads = np.bincount(pair_tokens, minlength=len(order))
+    token_ptr = np.zeros(len(order) + 1, dtype=np.int64)
+    np.cumsum(n_ads, out=token_ptr[1:])
+    token_ads = (pairs // max(len(order), 1))[np.argsort(pair_tokens, kind="stable")]
+
+    vocab = np.asarray(uniques, dtype=object)[order]
+    return {
+        "vocab": vocab.astype(str) if len(vocab) else np.empty(0, dtype="<U1"),
+        "counts": counts[order].astype(np.int64),
+        "n_ads": n_ads.astype(np.int64),
+        "offsets": offsets,
+        "ids": ids.astype(np.int32),
+        "token_ptr": token_ptr,
+        "token_ads": token_ads.astype(np.int32),
+    }
+
+
+def save_token_corpus(corpus: dict[str, np.ndarray], token_dir: Path, source: Path) -> Path:
+    # Plain .npy files so load_token_corpus can memory-map them; the manifest is written
+    # last, so a half-written directory is never picked up as valid.
+    token_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = token_dir / MANIFEST_NAME
+    if manifest_path.exists():
+        manifest_path.unlink()
+
+    for name, arr in corpus.items():
+        tmp = token_dir / f"{name}.tmp.npy"
+        np.save(tmp, arr)
+        os.replace(tmp, token_dir / f"{name}.npy")
+
+    pd.DataFrame({
+        "token_id": np.arange(len(corpus["vocab"])),
+        "token": corpus["vocab"],
+        "count": corpus["counts"],
+        "n_ads": corpus["n_ads"],
+    }).to_csv(token_dir / "vocab.csv", index=False, encoding="utf-8-sig")
+
+    manifest = {
+        "version": TOKENIZER_VERSION,
+        "source": str(source),
+        "n_ads": int(len(corpus["offsets"]) - 1),
+        "n_tokens": int(len(corpus["ids"])),
+        "vocab_size": int(len(corpus["vocab"])),
+    }
+    manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    return token_dir
+
+
+def load_token_corpus(token_dir: Path, mmap: bool = True) -> dict[str, np.ndarray]:
+    # Arrays are memory-mapped read-only by default; rows line up with the parsed CSV
+    # (check `fingerprints` against the frame when in doubt).
+    token_dir = Path(token_dir)
+    manifest_path = token_dir / MANIFEST_NAME
+    if not manifest_path.exists():
+        raise FileNotFoundError(f"Token corpus not found (run tokenize_corpus.py): {token_dir}")
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    if manifest.get("version") != TOKENIZER_VERSION:
+        raise ValueError(f"Token corpus {token_dir} was built by tokenizer v{manifest.get('version')}; rebuild it")
+
+    mode = "r" if mmap else None
+    corpus = {name: np.load(token_dir / f"{name}.npy", mmap_mode=mode)
+              for name in ["vocab", "counts", "n_ads", "offsets", "ids", "token_ptr", "token_ads", "fingerprints"]}
+    corpus["manifest"] = manifest
+    return corpus
+
+
+def token_lookup(corpus: dict[str, np.ndarray]) -> dict[str, int]:
+    return {t: i for i, t in enumerate(corpus["vocab"].tolist())}
+
+
+def ad_token_ids(corpus: dict[str, np.ndarray], i: int) -> np.ndarray:
+    return corpus["ids"][corpus["offsets"][i]:corpus["offsets"][i + 1]]
+
+
+def ads_with_token(corpus: dict[str, np.ndarray], token_id: int) -> np.ndarray:
+    # Row indices of the ads containing a token (ascending), a slice of the inverted index.
+    return corpus["token_ads"][corpus["token_ptr"][token_id]:corpus["token_ptr"][token_id + 1]]
+
+
+def main():
+    configure_stdout()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", type=str, default="outputs/ads_parsed_all.csv")
+    parser.add_argument("--out-dir", type=str, default="outputs/tokens", help="Directory for the vocabulary and CSR token arrays")
+    args = parser.parse_args()
+
+    root = Path(__file__).resolve().parents[1]
+    in_csv = (root / args.input).resolve()
+    token_dir = (root / args.out_dir).resolve()
+
+    if not in_csv.exists():
+        raise FileNotFoundError(f"Input CSV not found: {in_csv}")
+
+    df = pd.read_csv(in_csv, encoding="utf-8-sig")
+    if "text_norm" not in df.columns:
+        raise ValueError("Input CSV has no text_norm column; re-run parse_telegram.py")
+
+    t0 = time.perf_counter()
+    corpus = build_token_corpus(df["text_norm"])
+    corpus["fingerprints"] = ad_fingerprints(df).to_numpy(dtype=np.int64)
+    save_token_corpus(corpus, token_dir, in_csv)
+    elapsed = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    load_token_corpus(token_dir)
+    load_ms = (time.perf_counter() - t0) * 1000
+
+    print(" Saved:", token_dir)
+    print(f" Ads: {len(df)}  Tokens: {len(corpus['ids'])}  Vocabulary: {len(corpus['vocab'])}  ({elapsed:.2f}s, reload {load_ms:.1f} ms)")
+    top = ", ".join(corpus["vocab"][:10].tolist())
+    print(f" Most frequent: {top}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import datetime as dt
+import html
+import json
+import random
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# The pipeline scripts import each other as top-level modules from src/.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+
+TITLES = ["کارشناس حسابداری", "معامله‌گر بورس کالا", "تحلیلگر داده", "مدیر سبد", "منشی"]
+LINES = [
+    "نام شرکت: کارگزاری مفید",
+    "شهر: تهران - ونک",
+    "سابقه کار: ۲ تا ۵ سال",
+    "مدرک تحصیلی: کارشناسی",
+    "ارسال رزومه &amp; info@x.ir",
+    "مهارت: اکسل و Power BI",
+    "تسلط به پایتون و SQL، آشنایی با اصول حسابداری",
+]
+JOIN_WITHIN = dt.timedelta(minutes=15)
+
+
+def fake_messages(n: int, seed: int = 5) -> list[dict]:
+    # Channel posts and a few service messages; close posts by one sender join a group.
+    rng = random.Random(seed)
+    msgs = []
+    t = dt.datetime(2023, 3, 15, 8, 0, 0)
+    for msg_id in range(11, 11 + n):
+        t += dt.timedelta(minutes=rng.choice([1, 3, 8, 14, 16, 40, 200, 600]))
+        if rng.random() < 0.05:
+            msgs.append({"id": msg_id, "type": "service", "date": t})
+            continue
+        sender = rng.choice(["channel1", "channel1", "channel1", "user2"])
+        lines = []
+        if rng.random() < 0.7:
+            lines.append(["استخدام «" + rng.choice(TITLES) + "»"])
+        for line in rng.sample(LINES, 3):
+            words = line.split(" ")
+            if rng.random() < 0.3:
+                lines.append([words[0] + " ", {"type": "bold", "text": words[1]}, " " + " ".join(words[2:])])
+            else:
+                lines.append([line])
+        msgs.append({
+            "id": msg_id, "type": "message", "date": t, "from_id": sender,
+            "from": "SEBA" if sender == "channel1" else "Ali", "lines": lines,
+        })
+    return msgs
+
+
+def utc_offset(t: dt.datetime) -> dt.timedelta:
+    # Two offsets, so the tooltips carry both +03:30 and +04:30.
+    return dt.timedelta(hours=4, minutes=30) if t >= dt.datetime(2023, 3, 22) else dt.timedelta(hours=3, minutes=30)
+
+
+def joins(msg: dict, prev: dict | None) -> bool:
+    if prev is None or prev["type"] != "message" or msg["type"] != "message":
+        return False
+    return msg["from_id"] == prev["from_id"] and msg["date"].date() == prev["date"].date() and msg["date"] - prev["date"] <= JOIN_WITHIN
+
+
+def write_html_export(msgs: list[dict], path: Path) -> Path:
+    body, prev = [], None
+    for m in msgs:
+        if m["type"] == "service":
+            body.append(f'<div class="message service" id="message-{m["id"]}"><div class="body details">x</div></div>')
+            prev = m
+            continue
+        joined, prev = joins(m, prev), m
+        h, r = divmod(int(utc_offset(m["date"]).total_seconds()) // 60, 60)
+        title = m["date"].strftime("%d.%m.%Y %H:%M:%S") + f" UTC+{h:02d}:{r:02d}"
+        text = "<br>".join(
+            "".join("<strong>" + html.escape(p["text"], quote=False) + "</strong>" if isinstance(p, dict) else html.escape(p, quote=False) for p in line)
+            for line in m["lines"]
+        )
+        inner = f'<div class="pull_right date details" title="{title}">x</div>'
+        if not joined:
+            inner += f'<div class="from_name">{m["from"]}</div>'
+        inner += f'<div class="text">{text}</div>'
+        body.append(f'<div class="message default clearfix{" joined" if joined else ""}" id="message{m["id"]}"><div class="body">{inner}</div></div>')
+    path.write_text(
+        '<!DOCTYPE html><html><head><meta charset="utf-8"/></head><body><div class="history">' + "\n".join(body) + "</div></body></html>",
+        encoding="utf-8",
+    )
+    return path
+
+
+def write_json_export(msgs: list[dict], path: Path) -> Path:
+    out = []
+    for m in msgs:
+        unix = int((m["date"] - utc_offset(m["date"])).replace(tzinfo=dt.timezone.utc).timestamp())
+        d = {"id": m["id"], "type": m["type"], "date": m["date"].isoformat(), "date_unixtime": str(unix)}
+        if m["type"] == "message":
+            d.update({"from": m["from"], "from_id": m["from_id"]})
+            parts: list = []
+            for i, line in enumerate(m["lines"]):
+                parts += line + (["\n"] if i < len(m["lines"]) - 1 else [])
+            # Telegram merges adjacent plain strings, and a plain-only text is one string.
+            text: list = []
+            for p in parts:
+                if text and isinstance(p, str) and isinstance(text[-1], str):
+                    text[-1] += p
+                else:
+                    text.append(p)
+            d["text"] = text[0] if len(text) == 1 and isinstance(text[0], str) else text
+        else:
+            d.update({"action": "pin_message", "text": ""})
+        out.append(d)
+    path.write_text(json.dumps({"name": "SEBA", "type": "public_channel", "id": 1, "messages": out}, ensure_ascii=False, indent=1), encoding="utf-8")
+    return path
+
+
+@pytest.fixture(scope="session")
+def telegram_export(tmp_path_factory) -> dict[str, Path]:
+    # The same channel history as a Telegram Desktop HTML export and as result.json.
+    out = tmp_path_factory.mktemp("export")
+    msgs = fake_messages(240)
+    return {
+        "html": write_html_export(msgs, out / "messages.html"),
+        "json": write_json_export(msgs, out / "result.json"),
+    }
+
+
+@pytest.fixture(scope="session")
+def skill_catalog() -> tuple[list[dict], dict]:
+    from catalog_bundle import compile_skill_patterns
+    from skill_matcher import compile_skill_matcher
+
+    compiled = compile_skill_patterns()
+    return compiled, compile_skill_matcher(compiled)
+
+
+@pytest.fixture(scope="session")
+def skill_texts(skill_catalog):
+    # Normalized ads dense in catalog literals, glued to neighbouring letters and digits so
+    # boundary assertions matter, in upper case, and with the non-ASCII case folds (İ, K).
+    from skill_matcher import expand_literals, split_alternatives
+    from text_normalize import normalize_series
+
+    rng = random.Random(1)
+    compiled, _ = skill_catalog
+    pieces = [lit for it in compiled for alt in split_alternatives(it["pattern"]) for lit in expand_literals(alt, skip_lookarounds=True) or []]
+    filler = " ".join(TITLES + LINES).split()
+    texts = []
+    for _ in range(1500):
+        words = []
+        for _ in range(rng.randint(5, 60)):
+            if rng.random() < 0.15:
+                p = rng.choice(pieces)
+                p = p.upper() if rng.random() < 0.2 else p
+                words.append(rng.choice(["", " ", "x", "_", "ی", "1"]) + p + rng.choice(["", " ", "s", "_", "ی", "2"]))
+            else:
+                words.append(rng.choice(filler))
+        texts.append(" ".join(words))
+    texts += [t.replace("k", "K", 1).replace("i", "İ", 1) for t in texts[:200]]
+    return normalize_series(pd.Series(texts))
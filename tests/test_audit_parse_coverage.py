@@ -0,0 +1,9 @@
+from audit_parse_coverage import count_json_messages
+from parse_telegram import parse_ads_from_json
+
+
+def test_json_verify_counts_match_parser(telegram_export):
+    stats = parse_ads_from_json(telegram_export["json"]).attrs["parse_stats"]
+    n_default, n_joined, n_groups = count_json_messages(telegram_export["json"])
+    assert (n_default, n_joined, n_groups) == (stats["default_messages"], stats["joined_messages"], stats["groups"])
+    assert n_joined > 0
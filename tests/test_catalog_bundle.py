@@ -0,0 +1,21 @@
+import catalog_bundle
+from catalog_bundle import load_catalog_bundle
+
+
+def test_warm_load_trusts_unchanged_sources(tmp_path, monkeypatch):
+    path = tmp_path / "catalog_bundle.pkl"
+    assert not load_catalog_bundle(path)["cached"]
+
+    hashed = []
+    real_hash = catalog_bundle.catalog_hash
+    monkeypatch.setattr(catalog_bundle, "catalog_hash", lambda: hashed.append(1) or real_hash())
+    bundle = load_catalog_bundle(path, sections=["skills", "skill_matcher"])
+    assert bundle["cached"] and not hashed
+    # The skill sections are pattern sources, compiled by match_skills on use.
+    assert all("regex" not in c for c in bundle["skills"])
+    assert isinstance(bundle["skill_matcher"]["scan_ci"], str)
+    assert all(isinstance(alt["pattern"], str) for alt in bundle["skill_matcher"]["regex_alts"])
+
+    # A touched source is hashed again; same contents, so the bundle is still used.
+    monkeypatch.setattr(catalog_bundle, "source_stats", lambda: [[0, 0]] * len(catalog_bundle.CATALOG_SOURCES))
+    assert load_catalog_bundle(path, sections=["jobs"])["cached"] and hashed
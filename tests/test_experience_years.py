@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+from experience_years import EXP_WINDOW_CHARS, experience_windows, extract_experience_years
+
+
+def years(text: str) -> tuple[float, float]:
+    out = extract_experience_years(pd.Series([""]), pd.Series([text]))
+    return out.at[0, "exp_min_years"], out.at[0, "exp_max_years"]
+
+
+def with_gap(before: str, after: str, cut: int) -> str:
+    # before + filler + "سابقه" + filler + after, the window edge `cut` chars into `before`
+    # (cut > 0) or into `after` (cut < 0).
+    anchor = "سابقه"
+    if cut > 0:
+        return before + "x" * (EXP_WINDOW_CHARS - len(before) + cut - 1) + " " + anchor
+    return anchor + " " + "x" * (EXP_WINDOW_CHARS - 2 + cut) + " " + after
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        # The window starts between the digits of "12".
+        (with_gap("aa 12 سال ", "", 4), (12.0, float("nan"))),
+        # The window starts inside the upper bound of a range.
+        (with_gap("2 تا 12 سال ", "", 6), (2.0, 12.0)),
+        # The window ends right after the lower bound of a range.
+        (with_gap("", "2 تا 5 سال بیشتر", -1), (2.0, 5.0)),
+        # The window ends before the "سال" of "12 سال".
+        (with_gap("", "12 سال و بیشتر", -2), (12.0, float("nan"))),
+    ],
+)
+def test_phrase_at_window_edge(text, expected):
+    assert years(text) == pytest.approx(expected, nan_ok=True)
+
+
+def test_window_edges_cut_the_phrase_without_widening():
+    # The fixtures above do put the edge inside the phrase.
+    text = with_gap("aa 12 سال ", "", 4)
+    start = text.index("سابقه") - EXP_WINDOW_CHARS
+    assert text[start:].startswith("2 سال")
+    assert experience_windows(text).startswith("12 سال")
+
+
+def test_far_numbers_are_ignored():
+    text = "5 سال " + "x" * 200 + " سابقه کار الزامی"
+    assert years(text) == pytest.approx((float("nan"), float("nan")), nan_ok=True)
+
+
+def test_experience_field_and_kinds():
+    out = extract_experience_years(
+        pd.Series(["حداقل 3 سال", "", "بدون سابقه"]),
+        pd.Series(["", "سابقه 1 تا 4 سال", "5 سال سابقه"]),
+    )
+    assert out["exp_min_years"].tolist() == [3.0, 1.0, 0.0]
+    assert out["exp_max_years"].tolist()[1:] == [4.0, 0.0]
@@ -0,0 +1,36 @@
+import random
+import re
+
+from field_extractor import FIELD_KEYS, extract_fields
+
+
+def extract_field_anykey(text, keys):
+    # The per-key regex search extract_fields replaced.
+    for k in keys:
+        m = re.search(rf"{re.escape(k)}\s*[:：]?\s*(.+)", text)
+        if m:
+            return m.group(1).strip().split("\n")[0].strip()
+    return None
+
+
+def fake_texts(n: int, seed: int = 3) -> list[str]:
+    # Keys that overlap (شهر / شهرستان, سابقه / سابقه کار), keys with no value on their
+    # line, both colons and repeated keys.
+    rng = random.Random(seed)
+    keys = [k for ks in FIELD_KEYS.values() for k in ks]
+    values = ["تهران", "کارشناسی ارشد", "۳ سال", "بورس", "", " ", "کارگزاری آگاه - ونک"]
+    texts = []
+    for _ in range(n):
+        lines = []
+        for _ in range(rng.randint(0, 6)):
+            lines.append(
+                rng.choice(["", "متن ", "• "]) + rng.choice(keys) + rng.choice(["", " ", ":", "：", " : "]) + rng.choice(values)
+            )
+        texts.append(rng.choice(["\n", " ", "\n\n"]).join(lines))
+    return texts + ["", "شهر", "شهرستان:\nتهران", "سابقه کاری: ۲ سال\nسابقه: ۵ سال"]
+
+
+def test_extract_fields_matches_per_key_search():
+    for text in fake_texts(2000):
+        expected = {field: extract_field_anykey(text, keys) for field, keys in FIELD_KEYS.items()}
+        assert extract_fields(text) == expected, text
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from multilabel_codec import decode_labels, encode_labels, explode_labels
+
+
+@pytest.fixture
+def matrix():
+    rng = np.random.default_rng(7)
+    values = rng.random((300, 12)) < 0.15
+    values[:20] = False
+    return pd.DataFrame(values, columns=[f"S{k}" for k in range(12)], index=range(1000, 1300))
+
+
+def test_encode_decode_round_trip(matrix):
+    cells = encode_labels(matrix)
+    assert cells.index.equals(matrix.index)
+    offsets, codes, vocab = decode_labels(cells)
+    decoded = [vocab[codes[offsets[i]:offsets[i + 1]]].tolist() for i in range(len(matrix))]
+    assert decoded == [list(matrix.columns[row]) for row in matrix.to_numpy()]
+
+
+def test_explode_matches_split_and_explode():
+    df = pd.DataFrame({
+        "ad": range(8),
+        "skills": ["A|B", " A | C ", None, "", "nan", "None|B", "B||A", "C"],
+    })
+    expected = df.assign(skill=df["skills"].fillna("").astype(str).str.split("|")).explode("skill")
+    expected["skill"] = expected["skill"].str.strip()
+    expected = expected[expected["skill"].ne("")]
+    # A cell that is only a missing marker holds no labels.
+    expected = expected[~(expected["skill"].str.lower().isin(["nan", "none"]) & ~expected["skills"].str.contains("|", regex=False))]
+    out = explode_labels(df, "skills")
+    assert out["ad"].tolist() == expected["ad"].tolist()
+    assert out["skill"].tolist() == expected["skill"].tolist()
@@ -0,0 +1,56 @@
+import os
+import re
+import shutil
+
+import pandas.testing as pdt
+
+from parse_telegram import parse_with_cache
+
+
+def copy_export(telegram_export, tmp_path):
+    src = tmp_path / "raw"
+    src.mkdir()
+    return shutil.copy(telegram_export["html"], src / "messages.html")
+
+
+def parse(f, cache_dir, capsys, **parse_kwargs):
+    # The parsed frame and whether it came from the cache.
+    [df] = parse_with_cache([f], [cache_dir], **parse_kwargs)
+    reused = re.search(r"Cache: (\d+) files reused", capsys.readouterr().out)
+    return df, int(reused.group(1)) == 1
+
+
+def test_unchanged_file_comes_from_cache(telegram_export, tmp_path, capsys):
+    f = copy_export(telegram_export, tmp_path)
+    fresh, was_cached = parse(f, tmp_path / "cache", capsys)
+    assert not was_cached
+    cached, was_cached = parse(f, tmp_path / "cache", capsys)
+    assert was_cached
+    pdt.assert_frame_equal(cached, fresh)
+
+
+def test_touched_file_with_same_content_stays_cached(telegram_export, tmp_path, capsys):
+    f = copy_export(telegram_export, tmp_path)
+    parse(f, tmp_path / "cache", capsys)
+    st = f.stat()
+    os.utime(f, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert parse(f, tmp_path / "cache", capsys)[1]
+
+
+def test_edited_file_is_parsed_again(telegram_export, tmp_path, capsys):
+    f = copy_export(telegram_export, tmp_path)
+    before, _ = parse(f, tmp_path / "cache", capsys)
+    # Same size, different bytes, so only the hash can tell.
+    data = f.read_bytes()
+    assert "منشی".encode("utf-8") in data
+    f.write_bytes(data.replace("منشی".encode("utf-8"), "مدیر".encode("utf-8"), 1))
+    after, was_cached = parse(f, tmp_path / "cache", capsys)
+    assert not was_cached
+    assert not after["text_raw"].equals(before["text_raw"])
+
+
+def test_new_triage_threshold_invalidates_cache(telegram_export, tmp_path, capsys):
+    f = copy_export(telegram_export, tmp_path)
+    parse(f, tmp_path / "cache", capsys, min_score=1)
+    assert not parse(f, tmp_path / "cache", capsys, min_score=2)[1]
+    assert parse(f, tmp_path / "cache", capsys, min_score=2)[1]
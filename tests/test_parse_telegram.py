@@ -0,0 +1,115 @@
+import datetime as dt
+import sys
+
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from conftest import fake_messages, write_html_export
+
+from parse_telegram import (
+    MESSAGE_DIV_RE,
+    build_ads_frame,
+    merge_reposts,
+    parse_ads_from_html,
+    parse_ads_from_json,
+    plan_chunks,
+    main,
+    stitch_chunks,
+)
+
+
+def test_stream_parser_matches_soup(telegram_export):
+    stream = parse_ads_from_html(telegram_export["html"], parser="stream")
+    soup = parse_ads_from_html(telegram_export["html"], parser="soup")
+    assert len(stream) > 0
+    pdt.assert_frame_equal(stream, soup)
+    assert stream.attrs["parse_stats"] == soup.attrs["parse_stats"]
+
+
+def test_json_export_matches_html(telegram_export):
+    from_html = parse_ads_from_html(telegram_export["html"])
+    from_json = parse_ads_from_json(telegram_export["json"])
+    pdt.assert_frame_equal(from_html.drop(columns="source_file"), from_json.drop(columns="source_file"))
+    for key in ["default_messages", "joined_messages", "groups", "duplicates"]:
+        assert from_html.attrs["parse_stats"][key] == from_json.attrs["parse_stats"][key]
+
+
+@pytest.mark.parametrize("n_chunks", [2, 3, 7, 50])
+def test_chunks_start_on_groups_and_stitch_to_serial_parse(telegram_export, n_chunks):
+    path = telegram_export["html"]
+    ranges = plan_chunks(path, n_chunks)
+    assert ranges[0][0] == 0 and ranges[-1][1] == path.stat().st_size
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+
+    data = path.read_bytes()
+    for start, _ in ranges[1:]:
+        m = MESSAGE_DIV_RE.match(data, start)
+        classes = (m.group(1) or b"").split()
+        assert b"default" in classes and b"joined" not in classes
+
+    serial = parse_ads_from_html(path)
+    stitched = stitch_chunks([parse_ads_from_html(path, byte_range=r) for r in ranges])
+    for key in ["default_messages", "joined_messages", "groups"]:
+        assert stitched.attrs["parse_stats"][key] == serial.attrs["parse_stats"][key]
+
+    # Each chunk folds its own reposts; main folds the rest across chunks like across files
+    # and writes the same CSV (a chunk with no company at all concatenates as object).
+    def folded(df):
+        return merge_reposts(df.assign(channel="c")).to_csv(index=False)
+
+    assert folded(stitched) == folded(serial)
+
+
+def test_chunks_of_a_single_range(telegram_export):
+    path = telegram_export["html"]
+    assert plan_chunks(path, 1) == [(0, path.stat().st_size)]
+    whole = parse_ads_from_html(path, byte_range=(0, path.stat().st_size))
+    pdt.assert_frame_equal(whole, parse_ads_from_html(path))
+
+
+def test_job_and_non_job_reposts_fold_on_the_same_text():
+    # The reposts differ only in what normalization folds (Arabic letters, spacing).
+    texts = [
+        "دوره آموزشی بورس ، ثبت نام کنید",
+        "دوره  آموزشي بورس ، ثبت نام کنيد",
+        "استخدام «منشی»\nشهر: تهران\nمدرک: کارشناسی",
+        "استخدام «منشی»\nشهر: تهران\nمدرک:  کارشناسي",
+    ]
+    groups = [{"group_index": i, "message_ids": f"message{i}", "dt_title": None, "text": t} for i, t in enumerate(texts)]
+    df = build_ads_frame(groups, "messages.html", {})
+    assert df["repost_count"].tolist() == [2, 2]
+    assert df["text_norm"].isna().tolist() == [True, False]
+
+
+def run_parse(monkeypatch, out_csv, *args):
+    monkeypatch.setattr(sys, "argv", ["parse_telegram.py", "--output", str(out_csv), "--no-cache", "--format", "html", *args])
+    main()
+    return pd.read_csv(out_csv, encoding="utf-8-sig")
+
+
+def test_append_counts_repost_channels_like_a_full_parse(tmp_path, monkeypatch):
+    # Channel a posts a history and later reposts all of it; channel b reposts it a day
+    # after a. The first run sees the start of both exports, the --append run all of them.
+    base = fake_messages(120)
+    a = base + [{**m, "id": m["id"] + 1000, "date": m["date"] + dt.timedelta(days=100)} for m in base]
+    b = [{**m, "date": m["date"] + dt.timedelta(days=1)} for m in base]
+    for name, msgs in [("a", a), ("b", b)]:
+        for part, n in [("start", 20 if name == "b" else 120), ("full", len(msgs))]:
+            (tmp_path / part / name).mkdir(parents=True, exist_ok=True)
+            write_html_export(msgs[:n], tmp_path / part / name / "messages.html")
+
+    def inputs(part):
+        # b first, so a fold of new rows from both channels keeps b's row.
+        return ["--input-dir", f"b={tmp_path / part / 'b'}", f"a={tmp_path / part / 'a'}"]
+
+    run_parse(monkeypatch, tmp_path / "appended" / "ads.csv", *inputs("start"))
+    appended = run_parse(monkeypatch, tmp_path / "appended" / "ads.csv", *inputs("full"), "--append")
+    full = run_parse(monkeypatch, tmp_path / "full" / "ads.csv", *inputs("full"))
+
+    cols = ["fingerprint", "repost_count", "repost_channels", "repost_channel_names"]
+    assert (full["repost_channels"] == 2).any()
+    pdt.assert_frame_equal(
+        appended[cols].sort_values("fingerprint", ignore_index=True),
+        full[cols].sort_values("fingerprint", ignore_index=True),
+    )
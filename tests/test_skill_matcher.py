@@ -0,0 +1,24 @@
+import pandas as pd
+import pandas.testing as pdt
+
+from skill_matcher import match_skills
+
+
+def test_matcher_matches_per_skill_regexes(skill_catalog, skill_texts):
+    compiled, matcher = skill_catalog
+    expected = pd.DataFrame({it["skill"]: skill_texts.str.contains(it["regex"], na=False) for it in compiled})
+    assert expected.to_numpy().sum() > len(skill_texts)
+    pdt.assert_frame_equal(match_skills(matcher, skill_texts), expected)
+
+
+def test_spans_do_not_change_the_matrix(skill_catalog, skill_texts):
+    _, matcher = skill_catalog
+    matrix, _ = match_skills(matcher, skill_texts, spans=True)
+    pdt.assert_frame_equal(matrix, match_skills(matcher, skill_texts))
+
+
+def test_missing_texts_match_nothing(skill_catalog):
+    _, matcher = skill_catalog
+    out = match_skills(matcher, pd.Series([None, "", "excel"], index=[5, 6, 7]))
+    assert out.index.tolist() == [5, 6, 7]
+    assert not out.loc[[5, 6]].to_numpy().any()
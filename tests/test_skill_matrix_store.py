@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from skill_matrix_store import (
+    align_ad_rows,
+    align_rows,
+    group_skill_counts,
+    load_skill_matrix,
+    relabel_skills,
+    save_skill_matrices,
+    skill_counts,
+    to_csr,
+)
+
+
+@pytest.fixture
+def matrix():
+    rng = np.random.default_rng(7)
+    values = rng.random((300, 12)) < 0.15
+    values[:20] = False
+    return pd.DataFrame(values, columns=[f"S{k}" for k in range(12)], index=range(1000, 1300))
+
+
+def csr_store(matrix, keys):
+    indptr, indices = to_csr(matrix)
+    return {"indptr": indptr, "indices": indices, "ad_key": keys, "skills": pd.DataFrame({"skill": matrix.columns})}
+
+
+def test_matrix_round_trip(matrix, tmp_path):
+    ad_key = pd.Series([f"ad{i}" for i in range(len(matrix))])
+    meta = pd.DataFrame({"skill": matrix.columns, "group": ["g1", "g2", "g3"] * 4})
+    path = save_skill_matrices(tmp_path / "m.npz", {"skills_extracted": matrix}, ad_key, meta)
+
+    store = load_skill_matrix(path)
+    assert store["ad_key"].tolist() == ad_key.tolist()
+    assert store["skills"]["skill"].tolist() == list(matrix.columns)
+    assert store["skills"]["group"].tolist() == meta["group"].tolist()
+    dense = np.zeros(matrix.shape, dtype=bool)
+    rows = np.repeat(np.arange(len(matrix)), np.diff(store["indptr"]))
+    dense[rows, store["indices"]] = True
+    np.testing.assert_array_equal(dense, matrix.to_numpy())
+    assert load_skill_matrix(path, "skills_extracted_fine") is None
+
+
+def test_align_rows_and_counts(matrix):
+    keys = np.array([f"ad{i}" for i in range(len(matrix))])
+    keys[5] = keys[4]
+    store = csr_store(matrix, keys)
+
+    wanted = pd.Series(["ad9", "ad4", "ad5", "ad0", "ad4"])
+    assert align_rows(store, pd.Series(["ad1", "missing"])) is None
+    rows = align_rows(store, wanted.where(wanted.ne("ad5"), "ad6"))
+    assert rows.tolist() == [9, 4, 6, 0, 4]
+    assert align_ad_rows(store, pd.Series(["ad1", "ad2"]), pd.Series([1, 1])) is None
+    assert align_ad_rows(store, pd.Series(["ad1", "ad1"]), pd.Series([1, 1])).tolist() == [1, 1]
+
+    np.testing.assert_array_equal(skill_counts(store), matrix.sum().to_numpy())
+    sel = np.arange(0, len(matrix), 3)
+    np.testing.assert_array_equal(skill_counts(store, sel), matrix.iloc[sel].sum().to_numpy())
+
+    groups = np.arange(len(sel)) % 4
+    expected = matrix.iloc[sel].groupby(groups).sum().to_numpy()
+    np.testing.assert_array_equal(group_skill_counts(store, sel, groups, 4), expected)
+
+
+def test_relabel_skills(matrix):
+    store = csr_store(matrix, np.arange(len(matrix)).astype(str))
+    labels = pd.Series(["g1", "g2", None, "g1"] * 3)
+    coarse = relabel_skills(store, labels)
+
+    expected = matrix.loc[:, labels.notna().to_numpy()].T.groupby(labels.dropna().to_numpy(), sort=False).any().T
+    assert coarse["skills"]["skill"].tolist() == list(expected.columns)
+    np.testing.assert_array_equal(skill_counts(coarse), expected.sum().to_numpy())
+    dense = np.zeros(expected.shape, dtype=bool)
+    dense[np.repeat(np.arange(len(matrix)), np.diff(coarse["indptr"])), coarse["indices"]] = True
+    pdt.assert_frame_equal(pd.DataFrame(dense, index=matrix.index, columns=expected.columns), expected)
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from skill_matcher import match_skills
+from skill_span_index import ad_spans, build_span_index, load_span_index, save_span_index, skill_spans
+
+
+@pytest.fixture(scope="module")
+def spans(skill_catalog, skill_texts):
+    _, matcher = skill_catalog
+    matrix, found = match_skills(matcher, skill_texts, spans=True)
+    return matrix, build_span_index(found, len(skill_texts), matrix.shape[1])
+
+
+def test_spans_cover_exactly_the_matrix(spans):
+    matrix, idx = spans
+    rows, cols = np.nonzero(matrix.to_numpy())
+    assert set(zip(idx["ad"].tolist(), idx["skill"].tolist())) == set(zip(rows.tolist(), cols.tolist()))
+
+
+def test_each_span_is_a_match_of_its_skill(skill_catalog, skill_texts, spans):
+    compiled, _ = skill_catalog
+    _, idx = spans
+    texts = skill_texts.tolist()
+    for ad, skill, start, end in zip(*(idx[c].tolist() for c in ["ad", "skill", "start", "end"])):
+        assert end > start
+        assert compiled[skill]["regex"].match(texts[ad], start), (compiled[skill]["skill"], texts[ad][start:end])
+
+
+def test_every_regex_match_start_has_a_span(skill_catalog, skill_texts, spans):
+    compiled, _ = skill_catalog
+    matrix, idx = spans
+    texts = skill_texts.tolist()
+    for skill in range(matrix.shape[1]):
+        found = skill_spans(idx, skill)
+        for ad in np.flatnonzero(matrix.iloc[:, skill].to_numpy())[:20].tolist():
+            starts = {m.start() for m in compiled[skill]["regex"].finditer(texts[ad])}
+            assert starts <= set(found.loc[found["ad"].eq(ad), "start"].tolist())
+
+
+def test_ad_and_skill_views_agree(spans):
+    _, idx = spans
+    by_ad = pd.concat([ad_spans(idx, row) for row in range(len(idx["ad_ptr"]) - 1)], ignore_index=True)
+    by_skill = pd.concat([skill_spans(idx, k) for k in range(len(idx["skill_ptr"]) - 1)], ignore_index=True)
+    key = ["ad", "skill", "start"]
+    assert by_ad[key].equals(by_ad[key].sort_values(key, ignore_index=True))
+    pd.testing.assert_frame_equal(by_ad, by_skill.sort_values(key, ignore_index=True))
+    assert not by_ad.duplicated(key).any()
+
+
+def test_save_and_load_round_trip(spans, tmp_path):
+    matrix, idx = spans
+    ad_key = pd.Series([f"k{i}" for i in range(len(idx["ad_ptr"]) - 1)])
+    path = save_span_index(tmp_path / "spans.npz", idx, ad_key, list(matrix.columns))
+    loaded = load_span_index(path)
+    assert loaded["skills"].tolist() == list(matrix.columns)
+    assert loaded["ad_key"].tolist() == ad_key.tolist()
+    for name, arr in idx.items():
+        np.testing.assert_array_equal(loaded[name], arr)
+        assert loaded[name].dtype == arr.dtype
+    assert load_span_index(tmp_path / "missing.npz") is None